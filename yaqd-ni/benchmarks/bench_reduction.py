@@ -0,0 +1,128 @@
+"""Per-measurement cost of shot reduction, precompiled plan vs per-channel masks.
+
+Run with `python benchmarks/bench_reduction.py` from an environment where yaqd-ni
+is installed.
+"""
+
+import argparse
+import timeit
+
+import numpy as np  # type: ignore
+
+from yaqd_ni._ni_daqmx_tmux import (
+    Channel,
+    Chopper,
+    compile_plan,
+    process_samples,
+    reduce_shots,
+)
+
+
+def make_channels(nchannels, nsamples):
+    channels = []
+    width = nsamples // (2 * nchannels + 1)
+    for i in range(nchannels):
+        channels.append(
+            Channel(
+                name=f"channel_{i}",
+                range=(-10.0, 10.0),
+                enabled=True,
+                physical_channel=f"ai{i}",
+                invert=bool(i % 2),
+                signal_start=i * width,
+                signal_stop=(i + 1) * width - 1,
+                signal_method="average",
+                use_baseline=True,
+                baseline_start=(nchannels + i) * width,
+                baseline_stop=(nchannels + i + 1) * width - 1,
+                baseline_method="average",
+            )
+        )
+    choppers = [
+        Chopper(
+            name="chopper",
+            enabled=True,
+            physical_channel=f"ai{nchannels}",
+            invert=False,
+            index=nsamples - 1,
+        )
+    ]
+    return channels, choppers
+
+
+def make_correspondances(nsamples, channels, choppers):
+    correspondances = np.zeros(nsamples)
+    for channel_index, channel in enumerate(channels):
+        for start, stop in [
+            (channel.signal_start, channel.signal_stop),
+            (channel.baseline_start, channel.baseline_stop),
+        ]:
+            correspondances[start + 1 : stop] = channel_index + 1
+    for chopper_index, chopper in enumerate(choppers):
+        correspondances[chopper.index] = -chopper_index - 1
+    return correspondances
+
+
+def legacy_reduce(correspondances, channels, choppers, samples):
+    """Shot reduction as implemented before the acquisition plan."""
+    shots = np.empty([len(channels) + len(choppers), samples.shape[1]])
+    i = 0
+    for channel_index, channel in enumerate(channels):
+        idxs = correspondances == channel_index + 1
+        idxs[channel.signal_stop + 1 :] = False
+        signal_shots = process_samples(channel.signal_method, samples[idxs])
+        idxs = correspondances == channel_index + 1
+        idxs[: channel.signal_stop + 1] = False
+        baseline_shots = process_samples(channel.baseline_method, samples[idxs])
+        shots[i] = signal_shots - baseline_shots
+        if channel.invert:
+            shots[i] *= -1
+        i += 1
+    for chopper in choppers:
+        out = samples[chopper.index].copy()
+        out[out <= 1.0] = -1.0
+        out[out > 1.0] = 1.0
+        if chopper.invert:
+            out *= -1
+        shots[i] = out
+        i += 1
+    return shots
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--nsamples", type=int, default=900)
+    parser.add_argument("--nchannels", type=int, default=4)
+    parser.add_argument("--nshots", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    channels, choppers = make_channels(args.nchannels, args.nsamples)
+    correspondances = make_correspondances(args.nsamples, channels, choppers)
+    plan = compile_plan(correspondances, channels, choppers)
+    print(f"nsamples={args.nsamples} nchannels={args.nchannels}")
+    print(f"{'nshots':>8} {'legacy (ms)':>12} {'plan (ms)':>12} {'speedup':>8}")
+    for nshots in args.nshots:
+        # samples are Fortran ordered as read from the DAQ, see _measure_samples
+        samples = np.random.default_rng(0).normal(size=(nshots, args.nsamples)).T
+        expected = legacy_reduce(correspondances, channels, choppers, samples)
+        assert np.allclose(reduce_shots(plan, samples), expected)
+        number = max(1, 10000 // nshots)
+        legacy = min(
+            timeit.repeat(
+                lambda: legacy_reduce(correspondances, channels, choppers, samples),
+                number=number,
+                repeat=args.repeat,
+            )
+        )
+        planned = min(
+            timeit.repeat(
+                lambda: reduce_shots(plan, samples), number=number, repeat=args.repeat
+            )
+        )
+        legacy, planned = 1e3 * legacy / number, 1e3 * planned / number
+        print(f"{nshots:>8} {legacy:>12.3f} {planned:>12.3f} {legacy / planned:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
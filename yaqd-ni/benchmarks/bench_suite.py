@@ -0,0 +1,243 @@
+"""Benchmarks of the ni-daqmx-tmux hot paths, run against the simulated driver.
+
+Sweeps nsamples, nshots and channel counts over sample correspondances, task
+construction, shot reduction, chopper binarization, chopper phase accumulation,
+process_samples and an end to end measure loop. Results can be stored as json and
+compared against a previous run, to catch regressions in rep rate capacity before
+they reach the lab.
+
+    python benchmarks/bench_suite.py --output before.json
+    python benchmarks/bench_suite.py --compare before.json
+
+Run from an environment where yaqd-ni is installed.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import pathlib
+import platform
+import sys
+import tempfile
+import time
+import timeit
+
+import numpy as np  # type: ignore
+
+from yaqd_ni._ni_daqmx_tmux import (
+    NiDaqmxTmux,
+    accumulate_phases,
+    compile_plan,
+    process_samples,
+    reduce_shots,
+    sample_correspondances,
+)
+
+SHOTS_PROCESSING = """
+import numpy as np
+
+def process(shots, names, kinds):
+    return list(np.mean(shots, axis=1)), names
+"""
+
+
+def make_config(nsamples, nchannels, shots_processing_path, read_binary=False):
+    """Daemon config with evenly spaced signal and baseline windows, and a chopper."""
+    width = nsamples // (2 * nchannels + 1)
+    channels = {}
+    for i in range(nchannels):
+        channels[f"ai{i}"] = {
+            "name": f"channel_{i}",
+            "invert": bool(i % 2),
+            "signal_start": i * width,
+            "signal_stop": (i + 1) * width - 1,
+            "signal_method": "average",
+            "use_baseline": True,
+            "baseline_start": (nchannels + i) * width,
+            "baseline_stop": (nchannels + i + 1) * width - 1,
+            "baseline_method": "average",
+        }
+    choppers = {f"ai{nchannels}": {"name": "chopper", "index": nsamples - 1}}
+    section = {
+        "port": 0,
+        "log_level": "error",
+        "device_name": "Dev1",
+        "nsamples": nsamples,
+        "channels": channels,
+        "choppers": choppers,
+        "shots_processing_path": str(shots_processing_path),
+        "read_binary": read_binary,
+        "processing_executor": "event_loop",
+        "driver": "simulated",
+        # time every startup step, and keep the task build out of the way
+        "startup_cache": False,
+        "build_task_in_background": False,
+        # trigger fast enough that the simulated device never holds a read back
+        "simulation": {"rep_rate": 1e9, "noise": 0.0},
+    }
+    return NiDaqmxTmux._parse_config({"bench": section}, "bench")
+
+
+def make_daemon(*args, **kwargs):
+    return NiDaqmxTmux("bench-ni-daqmx-tmux", make_config(*args, **kwargs), None)
+
+
+def close_daemon(daemon):
+    daemon.close()
+    for task in daemon._tasks:
+        task.cancel()
+
+
+def make_samples(daemon, nshots):
+    """Samples of shape (sample, shot), Fortran ordered as read from the DAQ."""
+    daemon.set_nshots(nshots)
+    daemon._update_task()
+    return daemon._measure_samples()
+
+
+def best(statement, repeat):
+    """Seconds per call of the fastest of repeat batches."""
+    timer = timeit.Timer(statement)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+async def run(args, shots_processing_path):
+    results = []
+
+    def record(benchmark, seconds, **params):
+        results.append({"benchmark": benchmark, "params": params, "seconds": seconds})
+        described = " ".join(f"{k}={v}" for k, v in params.items())
+        print(f"{benchmark:<16} {described:<56} {1e3 * seconds:>10.3f} ms", flush=True)
+
+    for nsamples, nchannels in itertools.product(args.nsamples, args.nchannels):
+        daemon = make_daemon(nsamples, nchannels, shots_processing_path)
+        params = dict(nsamples=nsamples, nchannels=nchannels)
+        channels, choppers = daemon._channels, daemon._choppers
+        seconds = best(
+            lambda: sample_correspondances(nsamples, channels, choppers), args.repeat
+        )
+        record("correspondances", seconds, **params)
+        seconds = best(daemon._create_task, args.repeat)
+        record("create_task", seconds, **params)
+        close_daemon(daemon)
+
+    for nsamples, nchannels, read_binary in itertools.product(
+        args.nsamples, args.nchannels, [False, True]
+    ):
+        daemon = make_daemon(nsamples, nchannels, shots_processing_path, read_binary)
+        plan = daemon._plan
+        coefficients = daemon._scaling_coefficients
+        dtype = "int16" if read_binary else "float64"
+        # plan of the same correspondances, reducing only the chopper
+        choppers = compile_plan(daemon._sample_correspondances, [], daemon._choppers)
+        for nshots in args.nshots:
+            params = dict(nsamples=nsamples, nchannels=nchannels, nshots=nshots)
+            itemsize = np.dtype(dtype).itemsize + (8 if read_binary else 0)
+            if nsamples * nshots * itemsize > args.max_bytes:
+                print(f"skipping {params}, larger than --max-bytes", flush=True)
+                continue
+            samples = make_samples(daemon, nshots)
+            seconds = best(
+                lambda: reduce_shots(plan, samples, coefficients), args.repeat
+            )
+            record("reduce", seconds, dtype=dtype, **params)
+            if not read_binary:
+                seconds = best(lambda: reduce_shots(choppers, samples), args.repeat)
+                record("chopper", seconds, **params)
+                shots = reduce_shots(plan, samples)
+                seconds = best(lambda: accumulate_phases(shots, nchannels), args.repeat)
+                record("phases", seconds, **params)
+                window = samples[: nsamples // (2 * nchannels + 1)]
+                for method in ["average", "sum", "min", "max"]:
+                    seconds = best(lambda: process_samples(method, window), args.repeat)
+                    record("process_samples", seconds, method=method, **params)
+            daemon._pool.release(samples)
+            del samples
+        close_daemon(daemon)
+
+    for nsamples, nchannels, nshots in itertools.product(
+        args.nsamples, args.nchannels, args.nshots
+    ):
+        params = dict(nsamples=nsamples, nchannels=nchannels, nshots=nshots)
+        if nsamples * nshots * 8 > args.max_bytes:
+            continue
+        daemon = make_daemon(nsamples, nchannels, shots_processing_path)
+        daemon.set_nshots(nshots)
+        await daemon._measure()  # first measurement configures timing
+        count, start = 0, time.perf_counter()
+        while count < 3 or time.perf_counter() - start < args.measure_seconds:
+            await daemon._measure()
+            count += 1
+        seconds = (time.perf_counter() - start) / count
+        record("measure", seconds, shots_per_second=round(nshots / seconds), **params)
+        close_daemon(daemon)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Print benchmarks that got slower than baseline, return the count."""
+    key = lambda r: (r["benchmark"], json.dumps(r["params"], sort_keys=True))
+    # measure loops report throughput as a parameter, which is not part of the key
+    for r in itertools.chain(results, baseline):
+        r["params"].pop("shots_per_second", None)
+    before = {key(r): r["seconds"] for r in baseline}
+    regressions = 0
+    for r in results:
+        if key(r) not in before:
+            continue
+        ratio = r["seconds"] / before[key(r)]
+        if ratio > 1 + tolerance:
+            regressions += 1
+            print(f"REGRESSION {r['benchmark']} {r['params']}: {ratio:.2f}x slower")
+    print(f"{regressions} regressions beyond {tolerance:.0%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--nsamples", type=int, nargs="+", default=[100, 900, 2000])
+    parser.add_argument("--nchannels", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--nshots", type=int, nargs="+", default=[10, 1000, 50000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--measure-seconds", type=float, default=1.0, help="duration of measure loops"
+    )
+    parser.add_argument(
+        "--max-bytes",
+        type=float,
+        default=512e6,
+        help="skip configurations with sample buffers larger than this",
+    )
+    parser.add_argument("--output", type=pathlib.Path, help="store results as json")
+    parser.add_argument("--compare", type=pathlib.Path, help="json of a previous run")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="slowdown reported as regression"
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        shots_processing_path = pathlib.Path(directory) / "shots_processing.py"
+        shots_processing_path.write_text(SHOTS_PROCESSING)
+        results = asyncio.run(run(args, shots_processing_path))
+
+    if args.output:
+        stored = {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": sys.version,
+            "numpy": np.__version__,
+            "machine": platform.platform(),
+            "results": results,
+        }
+        args.output.write_text(json.dumps(stored, indent=2))
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())["results"]
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Recordings written by Recorder, read back through Recording."""
+
+import numpy as np  # type: ignore
+import pytest  # type: ignore
+
+from yaqd_ni._recorder import Recorder, Recording
+
+NSAMPLES = 7
+NAMES = ["signal", "chopper"]
+
+
+def measurements(dtype, rng):
+    """Measurements of varying nshots, samples Fortran or C ordered."""
+    out = []
+    for measurement_id, nshots in [(1, 5), (2, 12), (4, 1), (5, 3)]:
+        if dtype == np.int16:
+            samples = rng.integers(-2000, 2000, (NSAMPLES, nshots), dtype)
+        else:
+            samples = rng.normal(size=(NSAMPLES, nshots))
+        if measurement_id % 2:
+            samples = np.asfortranarray(samples)
+        shots = rng.normal(size=(len(NAMES), nshots))
+        out.append((measurement_id, samples, shots))
+    return out
+
+
+@pytest.mark.parametrize("dtype", [np.float64, np.int16])
+def test_round_trip(tmp_path, dtype):
+    rng = np.random.default_rng(0)
+    coefficients = None
+    if dtype == np.int16:
+        coefficients = rng.normal(size=(NSAMPLES, 4))
+    released = []
+    recorder = Recorder(
+        tmp_path, NSAMPLES, dtype, NAMES, coefficients, release=released.append
+    )
+    expected = measurements(dtype, rng)
+    for measurement_id, samples, shots in expected:
+        assert recorder.record(measurement_id, samples, shots)
+    recorder.close()
+    assert recorder.recorded == len(expected) and recorder.dropped == 0
+    assert len(released) == len(expected)
+
+    recording = Recording(tmp_path)
+    assert len(recording) == len(expected)
+    assert list(recording.measurement_ids) == [m[0] for m in expected]
+    assert recording.names == NAMES and recording.dtype == np.dtype(dtype)
+    if coefficients is None:
+        assert recording.coefficients is None
+    else:
+        assert np.array_equal(recording.coefficients, coefficients)
+    for measurement_id, samples, shots in expected:
+        assert recording.samples(measurement_id).dtype == np.dtype(dtype)
+        assert np.array_equal(recording.samples(measurement_id), samples)
+        assert np.array_equal(recording.shots(measurement_id), shots)
+
+
+def test_append_and_settings(tmp_path):
+    rng = np.random.default_rng(1)
+    expected = measurements(np.float64, rng)
+    for part in [expected[:2], expected[2:]]:
+        recorder = Recorder(tmp_path, NSAMPLES, np.float64, NAMES)
+        for measurement_id, samples, shots in part:
+            recorder.record(measurement_id, samples, shots)
+        recorder.close()
+    recording = Recording(tmp_path)
+    for measurement_id, samples, shots in expected:
+        assert np.array_equal(recording.samples(measurement_id), samples)
+        assert np.array_equal(recording.shots(measurement_id), shots)
+    with pytest.raises(ValueError):
+        Recorder(tmp_path, NSAMPLES + 1, np.float64, NAMES)
+
+
+def test_unindexed_data_is_ignored(tmp_path):
+    rng = np.random.default_rng(2)
+    expected = measurements(np.float64, rng)
+    recorder = Recorder(tmp_path, NSAMPLES, np.float64, NAMES)
+    for measurement_id, samples, shots in expected:
+        recorder.record(measurement_id, samples, shots)
+    recorder.close()
+    # as left by a crash after data was written, before its index entry
+    with open(tmp_path / "samples.bin", "ab") as f:
+        f.write(rng.normal(size=(NSAMPLES, 4)).tobytes())
+    with open(tmp_path / "shots.bin", "ab") as f:
+        f.write(rng.normal(size=(len(NAMES), 4)).tobytes())
+    recording = Recording(tmp_path)
+    assert len(recording) == len(expected)
+    measurement_id, samples, shots = expected[-1]
+    assert np.array_equal(recording.samples(measurement_id), samples)
+    assert np.array_equal(recording.shots(measurement_id), shots)
@@ -0,0 +1,178 @@
+"""Vectorized sample correspondances and shot reduction against the original loops."""
+
+import warnings
+
+import numpy as np  # type: ignore
+import pytest  # type: ignore
+
+from yaqd_ni._ni_daqmx_tmux import (
+    Channel,
+    Chopper,
+    compile_plan,
+    plan_acquisition,
+    process_samples,
+    reduce_shots,
+    sample_correspondances,
+    scale_samples,
+)
+
+METHODS = ["average", "sum", "min", "max"]
+
+
+def loop_correspondances(nsamples, channels, choppers):
+    """Sample correspondances as computed per sample before vectorization."""
+    correspondances = np.zeros(nsamples)
+    for sample_index in range(nsamples):
+        channel_idxs = []
+        for channel_index, channel in enumerate(channels):
+            if not channel.enabled:
+                continue
+            if (
+                channel.signal_start - channel.signal_presample
+                < sample_index
+                < channel.signal_stop
+            ):
+                channel_idxs.append(channel_index + 1)
+            if channel.use_baseline and (
+                channel.baseline_start - channel.baseline_presample
+                < sample_index
+                < channel.baseline_stop
+            ):
+                channel_idxs.append(channel_index + 1)
+        if len(channel_idxs) == 1:
+            correspondances[sample_index] = channel_idxs[0]
+        elif len(channel_idxs) > 1:
+            correspondances[sample_index] = channel_idxs[
+                sample_index % len(channel_idxs)
+            ]
+    for chopper_index, chopper in enumerate(choppers):
+        if not chopper.enabled:
+            continue
+        correspondances[chopper.index] = -chopper_index - 1
+    return correspondances
+
+
+def loop_process(method, samples):
+    if samples.shape[0] == 0 and method in ("min", "max"):
+        return np.full(samples.shape[1], np.nan)  # the loop raised instead
+    return process_samples(method, samples)
+
+
+def loop_shots(correspondances, channels, choppers, samples):
+    """Shots as reduced with per-channel masks before the acquisition plan."""
+    rows = []
+    for channel_index, channel in enumerate(channels):
+        if not channel.enabled:
+            continue
+        idxs = correspondances == channel_index + 1
+        idxs[channel.signal_stop + 1 :] = False
+        signal_shots = loop_process(channel.signal_method, samples[idxs])
+        baseline_shots = 0
+        if channel.use_baseline:
+            idxs = correspondances == channel_index + 1
+            idxs[: channel.signal_stop + 1] = False
+            baseline_shots = loop_process(channel.baseline_method, samples[idxs])
+        shots = signal_shots - baseline_shots
+        rows.append(-shots if channel.invert else shots)
+    for chopper in choppers:
+        if not chopper.enabled:
+            continue
+        out = np.where(samples[chopper.index] > 1.0, 1.0, -1.0)
+        rows.append(-out if chopper.invert else out)
+    return np.array(rows)
+
+
+def random_settings(rng):
+    nsamples = int(rng.integers(10, 120))
+    channels = []
+    for index in range(int(rng.integers(1, 5))):
+        signal = sorted(int(i) for i in rng.integers(0, nsamples, 2))
+        baseline = sorted(int(i) for i in rng.integers(0, nsamples, 2))
+        channels.append(
+            Channel(
+                name=f"channel_{index}",
+                range=(-10.0, 10.0),
+                enabled=bool(rng.random() < 0.9),
+                physical_channel=f"ai{index}",
+                invert=bool(rng.integers(2)),
+                signal_start=signal[0],
+                signal_stop=signal[1],
+                signal_method=str(rng.choice(METHODS)),
+                use_baseline=bool(rng.integers(2)),
+                baseline_start=baseline[0],
+                baseline_stop=baseline[1],
+                baseline_method=str(rng.choice(METHODS)),
+                baseline_presample=int(rng.integers(0, baseline[0] + 1)),
+                signal_presample=int(rng.integers(0, signal[0] + 1)),
+            )
+        )
+    indices = rng.choice(nsamples, size=int(rng.integers(0, 3)), replace=False)
+    choppers = [
+        Chopper(
+            name=f"chopper_{k}",
+            enabled=bool(rng.random() < 0.9),
+            physical_channel=f"ai{len(channels) + k}",
+            invert=bool(rng.integers(2)),
+            index=int(index),
+        )
+        for k, index in enumerate(indices)
+    ]
+    return nsamples, channels, choppers
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_loops(seed):
+    rng = np.random.default_rng(seed)
+    for _ in range(50):
+        nsamples, channels, choppers = random_settings(rng)
+        expected = loop_correspondances(nsamples, channels, choppers)
+        assert np.array_equal(
+            sample_correspondances(nsamples, channels, choppers), expected
+        )
+        plan = plan_acquisition(nsamples, channels, choppers)
+        assert np.array_equal(plan.correspondances, expected)
+        samples = np.asfortranarray(rng.normal(0, 2, (nsamples, 30)))
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")  # means of empty windows
+            shots = loop_shots(expected, channels, choppers, samples)
+        assert np.allclose(
+            reduce_shots(plan, samples).reshape(shots.shape), shots, equal_nan=True
+        )
+
+
+@pytest.mark.parametrize("cubic", [False, True])
+def test_raw_codes_match_volts(cubic):
+    rng = np.random.default_rng(int(cubic))
+    for _ in range(100):
+        nsamples, channels, choppers = random_settings(rng)
+        plan = plan_acquisition(nsamples, channels, choppers)
+        compact = plan_acquisition(nsamples, channels, choppers, compact=True)
+        # coefficients are shared by the samples of each physical channel
+        coefficients = np.zeros((nsamples, 4))
+        for correspondance in np.unique(plan.correspondances):
+            gain = rng.choice([-1, 1]) * rng.uniform(1e-4, 1e-3)
+            row = [rng.normal(0, 0.01), gain, 0.0, 0.0]
+            if cubic:
+                row[2:] = [1e-10, 1e-15]
+            coefficients[plan.correspondances == correspondance] = row
+        raw = np.asfortranarray(rng.integers(-5000, 5000, (nsamples, 30), np.int16))
+        volts = np.asfortranarray(scale_samples(raw, coefficients))
+        assert np.allclose(
+            reduce_shots(compact, raw, coefficients),
+            reduce_shots(plan, volts),
+            equal_nan=True,
+        )
+
+
+def test_plan_equality():
+    rng = np.random.default_rng(0)
+    nsamples, channels, choppers = random_settings(rng)
+    # plans of the same settings are shared through their key
+    plan = plan_acquisition(nsamples, channels, choppers)
+    assert plan == plan_acquisition(nsamples, channels, choppers)
+    assert hash(plan) == hash(plan_acquisition(nsamples, channels, choppers))
+    # plans compiled without a key only equal themselves
+    correspondances = sample_correspondances(nsamples, channels, choppers)
+    compiled = [compile_plan(correspondances, channels, choppers) for _ in range(2)]
+    assert compiled[0] == compiled[0] and compiled[0] != compiled[1]
+    assert compiled[0] != plan and len(set(compiled)) == 2
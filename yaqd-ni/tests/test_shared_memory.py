@@ -0,0 +1,83 @@
+"""Samples and shots published to shared memory, read back by a client."""
+
+import numpy as np  # type: ignore
+import pytest  # type: ignore
+
+from yaqd_ni._ni_daqmx_tmux import scale_samples
+from yaqd_ni._shared_memory import SharedMemoryPublisher, SharedMemoryReader
+
+
+@pytest.fixture
+def publisher():
+    publisher = SharedMemoryPublisher()
+    yield publisher
+    publisher.close()
+
+
+def measurement(rng, nsamples, nshots, dtype=np.float64):
+    if dtype == np.int16:
+        samples = rng.integers(-2000, 2000, (nsamples, nshots), dtype)
+    else:
+        samples = rng.normal(size=(nsamples, nshots))
+    return np.asfortranarray(samples), rng.normal(size=(3, nshots))
+
+
+def test_round_trip(publisher):
+    rng = np.random.default_rng(0)
+    samples, shots = measurement(rng, 50, 20)
+    publisher.publish(1, samples, shots)
+    reader = SharedMemoryReader(publisher.name)
+    try:
+        measurement_id, read_samples, read_shots = reader.read()
+        assert measurement_id == reader.measurement_id == 1
+        assert np.array_equal(read_samples, samples)
+        assert np.array_equal(read_shots, shots)
+        # fewer shots fit the same segment
+        samples, shots = measurement(rng, 50, 10)
+        publisher.publish(2, samples, shots)
+        measurement_id, read_samples, read_shots = reader.read()
+        assert measurement_id == 2 and not reader.retired
+        assert np.array_equal(read_samples, samples)
+        assert np.array_equal(read_shots, shots)
+    finally:
+        reader.close()
+
+
+def test_grow_retires_segment(publisher):
+    rng = np.random.default_rng(1)
+    publisher.publish(1, *measurement(rng, 50, 20))
+    name = publisher.name
+    reader = SharedMemoryReader(name)
+    try:
+        samples, shots = measurement(rng, 50, 200)
+        publisher.publish(2, samples, shots)
+        assert publisher.name != name
+        assert reader.retired
+    finally:
+        reader.close()
+    reader = SharedMemoryReader(publisher.name)
+    try:
+        measurement_id, read_samples, read_shots = reader.read()
+        assert measurement_id == 2
+        assert np.array_equal(read_samples, samples)
+        assert np.array_equal(read_shots, shots)
+    finally:
+        reader.close()
+
+
+def test_raw_codes_are_scaled(publisher):
+    rng = np.random.default_rng(2)
+    samples, shots = measurement(rng, 50, 20, np.int16)
+    coefficients = np.zeros((50, 4))
+    coefficients[:, 0] = rng.normal(0, 0.01, 50)
+    coefficients[:, 1] = rng.uniform(1e-4, 1e-3, 50)
+    publisher.publish(1, samples, shots, coefficients)
+    reader = SharedMemoryReader(publisher.name)
+    try:
+        _, raw, _ = reader.read(scale=False)
+        assert raw.dtype == np.int16 and np.array_equal(raw, samples)
+        _, volts, read_shots = reader.read()
+        assert np.allclose(volts, scale_samples(samples, coefficients))
+        assert np.array_equal(read_shots, shots)
+    finally:
+        reader.close()
@@ -0,0 +1,148 @@
+"""Measurements end to end, against the simulated driver."""
+
+import asyncio
+
+import numpy as np  # type: ignore
+import pytest  # type: ignore
+
+from yaqd_ni._ni_daqmx_tmux import NiDaqmxTmux
+
+SHOTS_PROCESSING = """
+import numpy as np
+
+def process(shots, names, kinds):
+    return list(np.mean(shots, axis=1)), names
+"""
+
+NSAMPLES = 100
+NSHOTS = 20
+
+
+def make_daemon(tmp_path, **settings):
+    path = tmp_path / "shots_processing.py"
+    path.write_text(SHOTS_PROCESSING)
+    channels = {
+        f"ai{i}": {
+            "name": f"channel_{i}",
+            "signal_start": 10 + 30 * i,
+            "signal_stop": 30 + 30 * i,
+            "signal_method": "average",
+            "use_baseline": True,
+            "baseline_start": 70,
+            "baseline_stop": 80,
+            "baseline_method": "average",
+        }
+        for i in range(2)
+    }
+    section = {
+        "port": 0,
+        "log_level": "error",
+        "device_name": "Dev1",
+        "nsamples": NSAMPLES,
+        "channels": channels,
+        "choppers": {"ai2": {"name": "chopper", "index": 90}},
+        "shots_processing_path": str(path),
+        "driver": "simulated",
+        "startup_cache": False,
+        "build_task_in_background": False,
+        "simulation": {"rep_rate": 1e4, "noise": 0.0},
+        **settings,
+    }
+    return NiDaqmxTmux("daq", NiDaqmxTmux._parse_config({"daq": section}, "daq"), None)
+
+
+def close_daemon(daemon):
+    daemon.stop_looping()
+    daemon.close()
+    for task in daemon._tasks:
+        task.cancel()
+
+
+async def measured(daemon, measurement_id, timeout=10.0):
+    """Wait until measurement_id is done."""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while daemon._measurement_id < measurement_id:
+        assert asyncio.get_running_loop().time() < deadline, "measurement timed out"
+        await asyncio.sleep(0.001)
+
+
+def check_measurement(daemon, nshots=NSHOTS):
+    out = daemon.get_measured()
+    assert set(out) == set(daemon._channel_names) | {"measurement_id"}
+    # pulses are centered in the signal windows, baselines are flat
+    assert out["channel_0"] > 0.1 and out["channel_1"] > 0.1
+    samples = daemon.get_measured_samples()
+    assert samples.shape == (NSAMPLES, nshots) and samples.dtype == np.float64
+    shots = daemon.get_measured_shots()
+    assert shots.shape == (3, nshots) and np.isfinite(shots).all()
+    # the chopper alternates every shot
+    assert sorted(np.unique(shots[2])) == [-1.0, 1.0]
+    assert daemon.get_measured_nshots() == nshots
+
+
+@pytest.mark.parametrize(
+    "settings",
+    [
+        {},
+        {"acquisition_mode": "continuous"},
+        {"read_binary": True},
+        {"acquisition_mode": "continuous", "read_binary": True},
+        {"processing_executor": "process"},
+        {"processing_executor": "event_loop"},
+    ],
+    ids=["finite", "continuous", "binary", "continuous-binary", "process", "loop"],
+)
+def test_measure(tmp_path, settings):
+    async def main():
+        daemon = make_daemon(tmp_path, **settings)
+        try:
+            daemon.set_nshots(NSHOTS)
+            for _ in range(2):
+                await measured(daemon, daemon.measure())
+                check_measurement(daemon)
+        finally:
+            close_daemon(daemon)
+
+    asyncio.run(main())
+
+
+def test_measure_batch(tmp_path):
+    async def main():
+        daemon = make_daemon(tmp_path)
+        try:
+            daemon.set_nshots(NSHOTS)
+            await measured(daemon, daemon.measure_batch(3))
+            check_measurement(daemon, nshots=3 * NSHOTS)
+            batch = daemon.get_measured_batch()
+            assert all(len(values) == 3 for values in batch.values())
+            envelope = daemon.get_measured_shots_envelope("channel_0", 4)
+            assert envelope.shape == (3, 4)
+            assert list(envelope[0]) == [0, 15, 30, 45]  # first shot of each bin
+            # the next measurement is back to a single record
+            await measured(daemon, daemon.measure())
+            check_measurement(daemon)
+        finally:
+            close_daemon(daemon)
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("acquisition_mode", ["finite", "continuous"])
+def test_loop_with_prefetch(tmp_path, acquisition_mode):
+    async def main():
+        daemon = make_daemon(tmp_path, acquisition_mode=acquisition_mode)
+        try:
+            daemon.set_nshots(NSHOTS)
+            measurement_id = daemon.measure(loop=True)
+            await measured(daemon, measurement_id + 3)
+            check_measurement(daemon)
+            daemon.stop_looping()
+            while daemon._busy:
+                await asyncio.sleep(0.001)
+            assert daemon._prefetch is None  # discarded once looping ends
+            await measured(daemon, daemon.measure())
+            check_measurement(daemon)
+        finally:
+            close_daemon(daemon)
+
+    asyncio.run(main())
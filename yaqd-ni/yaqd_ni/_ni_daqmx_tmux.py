@@ -1,17 +1,35 @@
 import asyncio
+import collections
 import time
 import pathlib
 import importlib.util
 import ctypes
+import threading
+import weakref
+import concurrent.futures
+import functools
+import inspect
+import json
+from multiprocessing import shared_memory
 
-from dataclasses import dataclass
-from typing import Dict, Any, List, Tuple
+from dataclasses import dataclass, astuple, replace
+from typing import Dict, Any, List, Optional, Tuple
 import warnings
 
 import numpy as np  # type: ignore
+import platformdirs  # type: ignore
 
 from yaqd_core import HasMeasureTrigger, IsSensor, IsDaemon
 
+from .__version__ import __version__
+from ._recorder import Recorder
+from ._shared_memory import SharedMemoryPublisher
+from ._startup_cache import StartupCache, startup_key
+
+
+class AcquisitionError(Exception):
+    """Samples could not be acquired, the attempt may be retried."""
+
 
 def process_samples(method, samples):
     # samples arry shape: (sample, shot)
@@ -28,6 +46,566 @@ def process_samples(method, samples):
     return shots
 
 
+_BLOCK_SHOTS = 256  # reduced at once
+
+_reducers = {
+    "average": np.add,
+    "sum": np.add,
+    "min": np.minimum,
+    "max": np.maximum,
+}
+
+
+@dataclass
+class WindowGroup:
+    """Every sample window that shares a processing method.
+
+    Windows are stored as contiguous runs of samples so that a single reduceat call
+    over the sample axis reduces every run at once.
+    """
+
+    method: str
+    bounds: np.ndarray  # sorted run boundaries, as [start, stop, start, stop, ...]
+    order: np.ndarray  # permutation of runs into window order
+    starts: np.ndarray  # offset of each window within ordered runs
+    counts: np.ndarray  # number of samples in each window
+    rows: np.ndarray  # destination row of each window
+
+
+@dataclass(frozen=True, eq=False)
+class AcquisitionPlan:
+    """Precompiled sample windows, built once per sample correspondance array.
+
+    Window rows are ordered as all channel signals followed by all channel baselines.
+    Plans compare and hash by key, the settings they were compiled from. Plans
+    compiled without a key only equal themselves.
+    """
+
+    correspondances: np.ndarray
+    groups: List[WindowGroup]
+    fill: np.ndarray  # value of each window row before reduction
+    sign: np.ndarray  # -1 for inverted channels, 1 otherwise
+    chopper_indices: np.ndarray
+    chopper_sign: np.ndarray
+    used: Optional[np.ndarray] = None  # samples indexed by a compact plan
+    window_of: Optional[np.ndarray] = None  # window row of each sample, -1 if none
+    task_key: tuple = ()  # everything that determines the virtual channels
+    key: tuple = ()
+
+    @property
+    def nrows(self) -> int:
+        return len(self.sign) + len(self.chopper_sign)
+
+    def __eq__(self, other):
+        if not isinstance(other, AcquisitionPlan):
+            return NotImplemented
+        if not self.key or not other.key:
+            return self is other
+        return self.key == other.key
+
+    def __hash__(self):
+        if not self.key:
+            return object.__hash__(self)
+        return hash(self.key)
+
+
+def _contiguous_runs(idxs):
+    """Split sorted sample indices into (start, stop) runs."""
+    if not len(idxs):
+        return []
+    breaks = np.flatnonzero(np.diff(idxs) != 1) + 1
+    starts = idxs[np.concatenate([[0], breaks])]
+    stops = idxs[np.concatenate([breaks - 1, [len(idxs) - 1]])] + 1
+    return list(zip(starts, stops))
+
+
+def sample_correspondances(nsamples, channels, choppers) -> np.ndarray:
+    """Assign each sample to the channel or chopper read by its virtual channel.
+
+    Zero is a rest sample, positive is one plus the index of a channel and negative is
+    minus one minus the index of a chopper. Samples inside several windows are shared
+    round robin, going to the window at sample index modulo the number of windows.
+    """
+    correspondances = np.zeros(nsamples)
+    # open intervals of every window, signal before baseline of each channel
+    lower, upper, owners = [], [], []
+    for channel_index, channel in enumerate(channels):
+        if not channel.enabled:
+            continue
+        lower.append(channel.signal_start - channel.signal_presample)
+        upper.append(channel.signal_stop)
+        owners.append(channel_index + 1)
+        if channel.use_baseline:
+            lower.append(channel.baseline_start - channel.baseline_presample)
+            upper.append(channel.baseline_stop)
+            owners.append(channel_index + 1)
+    if owners:
+        sample_index = np.arange(nsamples)
+        active = np.array(lower)[:, None] < sample_index
+        active &= sample_index < np.array(upper)[:, None]
+        nactive = active.sum(axis=0)
+        shared = np.flatnonzero(nactive)
+        # rank of each active window among those containing the sample, from one
+        rank = np.cumsum(active[:, shared], axis=0)
+        chosen = rank == (shared % nactive[shared] + 1)
+        chosen &= active[:, shared]
+        correspondances[shared] = np.array(owners)[chosen.argmax(axis=0)]
+    for chopper_index, chopper in enumerate(choppers):
+        if not chopper.enabled:
+            continue
+        correspondances[chopper.index] = -chopper_index - 1
+    return correspondances
+
+
+def plan_acquisition(nsamples, channels, choppers, compact=False) -> AcquisitionPlan:
+    """Sample correspondances and their compiled plan, cached on the settings."""
+    channels = tuple(astuple(c) for c in channels)
+    choppers = tuple(astuple(c) for c in choppers)
+    return _plan_acquisition(nsamples, channels, choppers, compact)
+
+
+@functools.lru_cache(maxsize=16)
+def _plan_acquisition(nsamples, channels, choppers, compact) -> AcquisitionPlan:
+    key = (nsamples, channels, choppers, compact)
+    channels = [Channel(*c) for c in channels]
+    choppers = [Chopper(*c) for c in choppers]
+    correspondances = sample_correspondances(nsamples, channels, choppers)
+    correspondances.setflags(write=False)  # shared by every user of the plan
+    return compile_plan(correspondances, channels, choppers, compact, key)
+
+
+def compile_plan(
+    correspondances, channels, choppers, compact=False, key=()
+) -> AcquisitionPlan:
+    """Compile sample windows of enabled channels and choppers.
+
+    A compact plan indexes only the samples used by some window or chopper, in order,
+    rather than every sample.
+    """
+    nsamples = len(correspondances)
+    enabled = [(i, c) for i, c in enumerate(channels) if c.enabled]
+    sample_index = np.arange(nsamples)
+    fill = np.zeros(2 * len(enabled))
+    windows: Dict[str, List[Tuple[int, np.ndarray]]] = {}
+    for row, (channel_index, channel) in enumerate(enabled):
+        mine = correspondances == channel_index + 1
+        signal = np.flatnonzero(mine & (sample_index <= channel.signal_stop))
+        todo = [(row, signal, channel.signal_method)]
+        if channel.use_baseline:
+            baseline = np.flatnonzero(mine & (sample_index > channel.signal_stop))
+            todo.append((len(enabled) + row, baseline, channel.baseline_method))
+        for window_row, idxs, method in todo:
+            if method not in _reducers:
+                raise KeyError("sample processing method not recognized")
+            if idxs.size == 0:
+                # reduction of an empty window, as numpy would report it
+                fill[window_row] = 0.0 if method == "sum" else np.nan
+                continue
+            windows.setdefault(method, []).append((window_row, idxs))
+    chopper_indices = np.array([c.index for c in choppers if c.enabled], dtype=int)
+    used = None
+    if compact:
+        used = np.unique(
+            np.concatenate(
+                [idxs for ws in windows.values() for _, idxs in ws] + [chopper_indices]
+            )
+        )
+        windows = {
+            method: [(r, np.searchsorted(used, idxs)) for r, idxs in ws]
+            for method, ws in windows.items()
+        }
+        chopper_indices = np.searchsorted(used, chopper_indices)
+        nsamples = len(used)
+    window_of = np.full(nsamples, -1)
+    for ws in windows.values():
+        for row, idxs in ws:
+            window_of[idxs] = row
+    groups = []
+    for method, ws in windows.items():
+        # runs are numbered in window order, then sorted by position for reduceat
+        runs: List[Tuple[int, int]] = []
+        starts = []
+        for _, idxs in ws:
+            starts.append(len(runs))
+            runs += _contiguous_runs(idxs)
+        by_position = sorted(range(len(runs)), key=lambda k: runs[k][0])
+        bounds = [b for k in by_position for b in runs[k]]
+        if bounds[-1] == nsamples:
+            bounds.pop()  # reduceat runs the final segment to the end
+        groups.append(
+            WindowGroup(
+                method=method,
+                bounds=np.array(bounds),
+                order=np.argsort(by_position),
+                starts=np.array(starts),
+                counts=np.array([idxs.size for _, idxs in ws]),
+                rows=np.array([r for r, _ in ws]),
+            )
+        )
+    return AcquisitionPlan(
+        correspondances=correspondances,
+        groups=groups,
+        fill=fill,
+        sign=np.array([-1.0 if c.invert else 1.0 for _, c in enabled]),
+        chopper_indices=chopper_indices,
+        chopper_sign=np.array(
+            [-1.0 if c.invert else 1.0 for c in choppers if c.enabled]
+        ),
+        used=used,
+        window_of=window_of,
+        task_key=(
+            tuple(int(c) for c in correspondances),
+            tuple(channel.range for channel in channels),
+        ),
+        key=key,
+    )
+
+
+def task_acquires(task_key, plan) -> bool:
+    """Whether a task built for task_key reads every sample used by plan.
+
+    Samples the plan leaves at rest may be read from any physical channel, so windows
+    shrinking within the samples of their channel keep the task.
+    """
+    if task_key is None or task_key[1] != plan.task_key[1]:
+        return False
+    acquired = np.array(task_key[0])
+    used = plan.correspondances != 0
+    return np.array_equal(acquired[used], plan.correspondances[used])
+
+
+def scale_samples(raw, coefficients, rows=None) -> np.ndarray:
+    """Scale raw ADC codes of shape (sample, shot) into volts.
+
+    Coefficients have shape (sample, coefficient), in ascending polynomial order as
+    reported by DAQmxGetAIDevScalingCoeff. Optionally only scale the given rows.
+    """
+    # work on shape (shot, sample), which is C ordered for samples read from the DAQ
+    x = raw.T if rows is None else raw.T[:, rows]
+    c = coefficients if rows is None else coefficients[rows]
+    # higher orders are often zero, and cost a pass over every sample each
+    nonzero = np.flatnonzero(np.any(c != 0, axis=0))
+    c = c[:, : nonzero[-1] + 1 if nonzero.size else 1]
+    if c.shape[1] > 2:
+        x = x.astype(np.float64)  # once, rather than for every order
+    volts = np.empty(x.shape)
+    volts[:] = c[:, -1]
+    for k in range(c.shape[1] - 2, -1, -1):
+        volts *= x
+        volts += c[:, k]
+    return volts.T
+
+
+def _window_scaling(plan, coefficients) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """Gain and offset of each window row, scaling windows of raw codes into volts.
+
+    Only linear scaling commutes with reduction, and only where every sample of a
+    window shares coefficients, as samples of one physical channel and range do. Min
+    and max additionally need a positive gain. None if windows must be scaled first.
+    """
+    if plan.window_of is None or np.any(coefficients[:, 2:]):
+        return None
+    inside = plan.window_of >= 0
+    rows = plan.window_of[inside]
+    linear = coefficients[inside, :2]
+    scaling = np.zeros((len(plan.fill), 2))
+    scaling[:, 1] = 1.0  # empty windows keep their fill
+    scaling[rows] = linear
+    if not np.array_equal(scaling[rows], linear):
+        return None
+    offset, gain = scaling.T.copy()
+    for group in plan.groups:
+        if group.method == "sum":
+            offset[group.rows] *= group.counts
+        elif group.method != "average" and np.any(gain[group.rows] <= 0):
+            return None
+    return gain, offset
+
+
+def reduce_shots(
+    plan: AcquisitionPlan,
+    samples: np.ndarray,
+    coefficients=None,
+    out=None,
+    timings=None,
+) -> np.ndarray:
+    """Reduce samples of shape (sample, shot) into shots of shape (row, shot).
+
+    Rows are enabled channels followed by enabled choppers. Reduction is fastest when
+    samples are Fortran ordered, as read from the DAQ. Raw samples are scaled with
+    coefficients, only keeping the rows used by a compact plan. Where scaling is
+    linear, windows are reduced from raw codes and scaled afterwards. Seconds spent
+    thresholding choppers are stored in timings, if given.
+    """
+    scaling = None
+    used_runs = None
+    if coefficients is not None:
+        used = coefficients if plan.used is None else coefficients[plan.used]
+        scaling = _window_scaling(plan, used)
+        if plan.used is not None:
+            used_runs = _contiguous_runs(plan.used)
+    nshots = samples.shape[1]
+    if out is None:
+        out = np.empty((plan.nrows, nshots))
+    windows = np.empty((len(plan.fill), nshots))
+    windows[:] = plan.fill[:, None]
+    # blocks of shots keep casts and gathers within cache
+    for first in range(0, nshots, _BLOCK_SHOTS):
+        block = samples.T[first : first + _BLOCK_SHOTS]
+        if used_runs is not None:
+            pieces = [block[:, a:b] for a, b in used_runs]
+            block = np.concatenate([block[:, :0]] + pieces, axis=1)
+        if coefficients is not None:
+            if scaling is None:
+                block = scale_samples(block.T, used).T
+            else:
+                # sums of raw codes would overflow their integer type
+                block = block.astype(np.float64)
+        for group in plan.groups:
+            ufunc = _reducers[group.method]
+            # every other segment lies between runs, and is discarded
+            runs = ufunc.reduceat(block, group.bounds, axis=1)[:, ::2]
+            reduced = ufunc.reduceat(runs[:, group.order], group.starts, axis=1)
+            if group.method == "average":
+                reduced /= group.counts
+            windows[group.rows, first : first + _BLOCK_SHOTS] = reduced.T
+    if scaling is not None:
+        gain, offset = scaling
+        windows *= gain[:, None]
+        windows += offset[:, None]
+    # channels
+    nchannels = len(plan.sign)
+    np.subtract(windows[:nchannels], windows[nchannels:], out=out[:nchannels])
+    out[:nchannels] *= plan.sign[:, None]
+    # choppers
+    start = time.perf_counter()
+    cutoff = 1.0  # volts
+    choppers = out[nchannels:]
+    if coefficients is None:
+        chopper_volts = samples[plan.chopper_indices]
+    else:
+        rows = plan.chopper_indices
+        if plan.used is not None:
+            rows = plan.used[rows]
+        chopper_volts = scale_samples(samples, coefficients, rows)
+    np.greater(chopper_volts, cutoff, out=choppers)
+    choppers *= 2.0
+    choppers -= 1.0
+    choppers *= plan.chopper_sign[:, None]
+    if timings is not None:
+        timings["choppers"] = time.perf_counter() - start
+    return out
+
+
+def shot_envelope(values, bins) -> np.ndarray:
+    """First shot, minimum and maximum of bins of consecutive shots, shape (3, bin).
+
+    There are never more bins than shots.
+    """
+    bins = max(1, min(bins, len(values)))
+    starts = np.linspace(0, len(values), bins + 1).astype(int)[:-1]
+    return np.stack(
+        [
+            starts,
+            np.minimum.reduceat(values, starts),
+            np.maximum.reduceat(values, starts),
+        ]
+    )
+
+
+@dataclass
+class ChopperPhases:
+    """Channel means of one record, grouped by chopper phase.
+
+    In phase p, chopper k is high where bit k of p is set. Highs and lows are means
+    over every shot where a chopper is high or low, whatever the other choppers.
+    Means over no shots are NaN.
+    """
+
+    means: np.ndarray  # (channel, phase)
+    counts: np.ndarray  # (phase,)
+    highs: np.ndarray  # (channel, chopper)
+    lows: np.ndarray  # (channel, chopper)
+
+    @property
+    def differences(self) -> np.ndarray:
+        return self.highs - self.lows
+
+
+def accumulate_phases(shots, nchannels) -> ChopperPhases:
+    """Group channel rows of shots by the state of the chopper rows that follow."""
+    channels, choppers = shots[:nchannels], shots[nchannels:]
+    nchoppers = len(choppers)
+    nphases = 2**nchoppers
+    bits = np.arange(nchoppers)
+    phase = ((choppers > 0).astype(np.intp) << bits[:, None]).sum(axis=0)
+    counts = np.bincount(phase, minlength=nphases)
+    index = phase + nphases * np.arange(nchannels)[:, None]
+    sums = np.bincount(
+        index.ravel(), weights=channels.ravel(), minlength=nchannels * nphases
+    ).reshape(nchannels, nphases)
+    high = (np.arange(nphases)[:, None] >> bits) & 1 == 1  # (phase, chopper)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return ChopperPhases(
+            means=sums / counts,
+            counts=counts,
+            highs=(sums @ high) / (counts @ high),
+            lows=(sums @ ~high) / (counts @ ~high),
+        )
+
+
+@functools.lru_cache
+def _accepts_phases(process) -> bool:
+    return "phases" in inspect.signature(process).parameters
+
+
+def process_record(module, shots, names, kinds, phase_channels=False):
+    """Run shots processing on one record.
+
+    Chopper phases are accumulated if process accepts a phases keyword, or if
+    phase_channels is set, appending the high, low and difference of each channel
+    and chopper pair to the output.
+    """
+    nchannels = kinds.count("channel")
+    accepts = _accepts_phases(module.process)
+    if nchannels == len(kinds) or not (accepts or phase_channels):
+        return module.process(shots, names, kinds)
+    phases = accumulate_phases(shots, nchannels)
+    if accepts:
+        out = module.process(shots, names, kinds, phases=phases)
+    else:
+        out = module.process(shots, names, kinds)
+    if not phase_channels:
+        return out
+    return _append_phase_channels(out, phases, names, nchannels)
+
+
+def _append_phase_channels(out, phases, names, nchannels):
+    values, out_names = list(out[0]), list(out[1])
+    for i, channel in enumerate(names[:nchannels]):
+        for j, chopper in enumerate(names[nchannels:]):
+            values += [phases.highs[i, j], phases.lows[i, j]]
+            values.append(phases.differences[i, j])
+            out_names += [f"{channel}_{chopper}_{k}" for k in ("high", "low", "diff")]
+    return (values, out_names, *out[2:])
+
+
+# arguments of the last setup call of each shots processing module
+_setups: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def process_records(module, shots, names, kinds, records=1, phase_channels=False):
+    """Run shots processing on records of equally many shots.
+
+    If the module defines setup(names, kinds, nshots), it is called first whenever
+    its arguments changed, so masks and outputs can be prepared once. A module
+    defining process_batch(records, names, kinds) gets every record at once, with
+    shape (record, row, shot), and returns a list of the output of each record.
+    Otherwise process_record runs one record at a time.
+    """
+    nshots = shots.shape[1] // records
+    key = (tuple(names), tuple(kinds), nshots)
+    if hasattr(module, "setup") and _setups.get(module) != key:
+        module.setup(names, kinds, nshots)
+        _setups[module] = key
+    if not hasattr(module, "process_batch"):
+        return [
+            process_record(module, record, names, kinds, phase_channels)
+            for record in np.split(shots, records, axis=1)
+        ]
+    batch = shots.reshape(len(names), records, nshots).transpose(1, 0, 2)
+    outs = list(module.process_batch(batch, names, kinds))
+    nchannels = kinds.count("channel")
+    if phase_channels and nchannels < len(kinds):
+        outs = [
+            _append_phase_channels(
+                out, accumulate_phases(record, nchannels), names, nchannels
+            )
+            for out, record in zip(outs, batch)
+        ]
+    return outs
+
+
+def load_processing_module(path, source=None):
+    """Import shots processing from path, or from its source if given."""
+    path = pathlib.Path(path)
+    if (
+        spec := importlib.util.spec_from_file_location(
+            path.name.removesuffix(path.suffix), path
+        )
+    ) is not None:
+        module = importlib.util.module_from_spec(spec)
+        if source is None:
+            spec.loader.exec_module(module)
+        else:
+            exec(compile(source, str(path), "exec"), module.__dict__)
+        return module
+    else:
+        raise ImportError(f"cannot find shots_processing in path {path}")
+
+
+def process_measurement(
+    plan,
+    samples,
+    coefficients,
+    processing_module,
+    names,
+    kinds,
+    records=1,
+    phase_channels=False,
+):
+    """Reduce samples into shots and run shots processing, timing each stage.
+
+    Samples hold records of equally many shots, which are reduced all at once and
+    then processed one record at a time. Returns shots and a list of the output of
+    each record.
+    """
+    timings: Dict[str, float] = {}
+    start = time.perf_counter()
+    shots = reduce_shots(plan, samples, coefficients, timings=timings)
+    reduced = time.perf_counter()
+    outs = process_records(
+        processing_module, shots, names, kinds, records, phase_channels
+    )
+    timings["reduce"] = reduced - start - timings["choppers"]
+    timings["process"] = time.perf_counter() - reduced
+    return shots, outs, timings
+
+
+# shots processing module of a worker process, by path and source
+_worker_modules: Dict[tuple, Any] = {}
+
+
+def _process_in_worker(
+    path,
+    source,
+    plan,
+    shm_name,
+    shape,
+    dtype,
+    coefficients,
+    names,
+    kinds,
+    records,
+    phase_channels,
+):
+    """Run process_measurement in a worker process, on samples in shared memory."""
+    if (path, source) not in _worker_modules:
+        _worker_modules.clear()  # older versions of the file
+        _worker_modules[path, source] = load_processing_module(path, source)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        samples = np.ndarray(shape, dtype=dtype, buffer=shm.buf, order="F")
+        module = _worker_modules[path, source]
+        result = process_measurement(
+            plan, samples, coefficients, module, names, kinds, records, phase_channels
+        )
+        del samples  # release the exported buffer before closing
+    finally:
+        shm.close()
+    return result
+
+
 @dataclass
 class Channel:
     name: str
@@ -46,6 +624,25 @@ class Channel:
     signal_presample: int = 0
 
 
+def _check_window(channel, kind, nsamples):
+    """Raise ValueError unless the signal or baseline window of channel has samples.
+
+    A window holds samples i with start - presample < i < stop.
+    """
+    start = getattr(channel, f"{kind}_start")
+    stop = getattr(channel, f"{kind}_stop")
+    presample = getattr(channel, f"{kind}_presample")
+    if start is None or stop is None:
+        raise ValueError(f"set the {kind} window of {channel.name} first")
+    if not (0 <= presample and 0 <= start and stop <= nsamples):
+        raise ValueError(
+            f"{kind} window of {channel.name} must satisfy 0 <= presample, "
+            "0 <= start and stop <= nsamples"
+        )
+    if max(start - presample + 1, 0) >= stop:
+        raise ValueError(f"{kind} window of {channel.name} holds no samples")
+
+
 @dataclass
 class Chopper:
     name: str
@@ -55,6 +652,203 @@ class Chopper:
     index: int
 
 
+class RingBuffer:
+    """Shots written continuously by a reader thread, stored as (sample, shot).
+
+    Shots are addressed by their absolute index since the buffer was created.
+    """
+
+    def __init__(self, nsamples, capacity, dtype=np.float64):
+        self.capacity = capacity
+        self.data = np.empty((nsamples, capacity), dtype=dtype, order="F")
+        self.written = 0  # total number of shots ever written
+        self.writing = 0  # written, and being written, raised before each copy
+        self.closed = False
+        self._condition = threading.Condition()
+
+    def write(self, chunk):
+        n = chunk.shape[1]
+        self.writing = self.written + n  # readers of these slots must retry
+        start = self.written % self.capacity
+        first = min(n, self.capacity - start)
+        self.data[:, start : start + first] = chunk[:, :first]
+        self.data[:, : n - first] = chunk[:, first:]
+        with self._condition:
+            self.written += n
+            self._condition.notify_all()
+
+    def close(self):
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+    def wait_for(self, stop, timeout) -> bool:
+        """Wait until shot stop has been written, failing if no shot arrives in time."""
+        with self._condition:
+            while self.written < stop and not self.closed:
+                written = self.written
+                self._condition.wait(timeout)
+                if self.written == written:
+                    return False
+            return not self.closed
+
+    def read(self, stop, nshots, out) -> np.ndarray:
+        """Copy shots [stop - nshots, stop) into out, raising if they were overwritten.
+
+        Slots are checked against the shots being written, before and after the copy.
+        """
+        if self.writing - (stop - nshots) > self.capacity:
+            raise BufferError("requested shots were overwritten")
+        start = (stop - nshots) % self.capacity
+        first = min(nshots, self.capacity - start)
+        out[:, :first] = self.data[:, start : start + first]
+        out[:, first:] = self.data[:, : nshots - first]
+        if self.writing - (stop - nshots) > self.capacity:
+            raise BufferError("requested shots were overwritten during copy")
+        return out
+
+
+class BufferPool:
+    """Reusable sample buffers, handed out with a reference count.
+
+    Whoever acquires a buffer owns one reference, and must either release it or hand
+    it on. Acquisition hands its buffer to the measurement, which publishes it as the
+    measured samples. Published samples are released once the next measurement
+    replaces them, so get_measured_samples always returns a complete snapshot while
+    the next acquisition writes into another buffer.
+    """
+
+    def __init__(self, max_free=4):
+        self.max_free = max_free  # per shape and dtype
+        self._free: Dict[tuple, List[np.ndarray]] = {}
+        self._refs: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, shape, dtype) -> np.ndarray:
+        """Get a Fortran ordered buffer, with undefined contents."""
+        key = (tuple(shape), np.dtype(dtype).str)
+        with self._lock:
+            free = self._free.get(key)
+            buffer = free.pop() if free else None
+        if buffer is None:
+            buffer = np.empty(shape, dtype=dtype, order="F")
+            # forget buffers that are never released, e.g. by a cancelled acquisition
+            weakref.finalize(buffer, self._refs.pop, id(buffer), None)
+        with self._lock:
+            self._refs[id(buffer)] = 1
+        return buffer
+
+    def retain(self, buffer):
+        with self._lock:
+            if id(buffer) in self._refs:
+                self._refs[id(buffer)] += 1
+
+    def release(self, buffer):
+        if buffer is None:
+            return
+        with self._lock:
+            if id(buffer) not in self._refs:
+                return  # not from this pool
+            self._refs[id(buffer)] -= 1
+            if self._refs[id(buffer)] > 0:
+                return
+            free = self._free.setdefault((buffer.shape, buffer.dtype.str), [])
+            if len(free) < self.max_free:
+                free.append(buffer)
+
+
+class TimingStats:
+    """Rolling latency statistics of each measurement stage.
+
+    Keeps the latest window durations of each stage, recorded from any thread.
+    """
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._durations: Dict[str, collections.deque] = {}
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            if stage not in self._durations:
+                self._durations[stage] = collections.deque(maxlen=self.window)
+                self._counts[stage] = 0
+            self._durations[stage].append(seconds)
+            self._counts[stage] += 1
+
+    def update(self, timings):
+        for stage, seconds in timings.items():
+            self.record(stage, seconds)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Count of each stage, and mean, p50, p99 and max of its window in ms."""
+        with self._lock:
+            durations = {k: np.array(v) * 1e3 for k, v in self._durations.items()}
+            counts = dict(self._counts)
+        out = {}
+        for stage, ms in durations.items():
+            p50, p99 = np.percentile(ms, [50, 99])
+            out[stage] = {
+                "count": float(counts[stage]),
+                "mean": float(ms.mean()),
+                "p50": float(p50),
+                "p99": float(p99),
+                "max": float(ms.max()),
+            }
+        return out
+
+    def clear(self):
+        with self._lock:
+            self._durations.clear()
+            self._counts.clear()
+
+
+class RunningStatistics:
+    """Mean and standard deviation of each channel across measurements.
+
+    Accumulated since the last clear with Welford's algorithm, in constant memory,
+    and over the latest window measurements. Non-finite values are skipped.
+    """
+
+    def __init__(self, window=100):
+        self.window = window
+        self._welford: Dict[str, Tuple[int, float, float]] = {}  # count, mean, m2
+        self._recent: collections.deque = collections.deque(maxlen=window)
+
+    def update(self, values: Dict[str, float]):
+        values = {k: float(v) for k, v in values.items() if np.isfinite(v)}
+        for name, value in values.items():
+            count, mean, m2 = self._welford.get(name, (0, 0.0, 0.0))
+            count += 1
+            delta = value - mean
+            mean += delta / count
+            m2 += delta * (value - mean)
+            self._welford[name] = (count, mean, m2)
+        self._recent.append(values)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Count, mean, std and sem of each channel, overall and within the window."""
+        out = {}
+        for name, (count, mean, m2) in self._welford.items():
+            std = np.sqrt(m2 / (count - 1)) if count > 1 else np.nan
+            recent = np.array([v[name] for v in self._recent if name in v])
+            out[name] = {
+                "count": float(count),
+                "mean": mean,
+                "std": float(std),
+                "sem": float(std / np.sqrt(count)),
+                "window_count": float(recent.size),
+                "window_mean": float(recent.mean()) if recent.size else np.nan,
+                "window_std": float(recent.std(ddof=1)) if recent.size > 1 else np.nan,
+            }
+        return out
+
+    def clear(self):
+        self._welford.clear()
+        self._recent.clear()
+
+
 class NiDaqmxTmux(HasMeasureTrigger, IsSensor, IsDaemon):
     _kind = "ni-daqmx-tmux"
 
@@ -65,6 +859,13 @@ class NiDaqmxTmux(HasMeasureTrigger, IsSensor, IsDaemon):
         for k, d in self._config["channels"].items():
             d["range"] = tuple(d["range"])
             channel = Channel(**d, physical_channel=k)
+            kinds = ["signal", "baseline"] if channel.use_baseline else ["signal"]
+            for kind in kinds:
+                try:
+                    if channel.enabled:
+                        _check_window(channel, kind, self._config["nsamples"])
+                except ValueError as err:
+                    self.logger.warning(err)  # setters refuse such windows
             self._channels.append(channel)
         self._raw_channel_names = [
             c.name for c in self._channels if c.enabled
@@ -83,33 +884,55 @@ class NiDaqmxTmux(HasMeasureTrigger, IsSensor, IsDaemon):
         # run shots processing with fake data
         channel_names = [c.name for c in self._channels if c.enabled]
         chopper_names = [c.name for c in self._choppers if c.enabled]
-        shots = np.zeros(
-            (len(channel_names) + len(chopper_names), self._state["nshots"])
-        )
         names = channel_names + chopper_names
         kinds = ["channel"] * len(channel_names) + ["chopper"] * len(chopper_names)
+        self._shot_names = names
+        self._shot_kinds = kinds
 
         path = pathlib.Path(self._config["shots_processing_path"])
-        if (
-            spec := importlib.util.spec_from_file_location(
-                path.name.removesuffix(path.suffix), path
+        self._processing_mtime = path.stat().st_mtime_ns
+        # the validated source is what runs, also in worker processes
+        self._processing_source = path.read_text()
+        self.processing_module = load_processing_module(path, self._processing_source)
+
+        # driver
+        if self._config["driver"] == "simulated":
+            from ._simulated_daqmx import SimulatedDAQmx
+
+            self._daqmx = SimulatedDAQmx(
+                self._channels, self._choppers, **self._config["simulation"]
             )
-        ) is not None:
-            self.processing_module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(self.processing_module)
         else:
-            raise ImportError(f"cannot find shots_processing in path {path}")
+            import PyDAQmx  # type: ignore
 
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore")
-            out = self.processing_module.process(shots, names, kinds)
-        self._channel_names = out[1]  # expected by parent
+            self._daqmx = PyDAQmx
+
+        # artifacts derived from config, device and shots processing
+        cache, cached, key = None, None, None
+        if self._config["startup_cache"]:
+            cache = StartupCache()
+            key = startup_key(
+                __version__,
+                np.__version__,
+                json.dumps(self._config, sort_keys=True, default=str),
+                self._processing_source,
+                *self._get_device_identity(),
+            )
+            cached = cache.load(key)
+        if cached is None:
+            channel_names = self._dry_run_processing(self.processing_module)
+        else:
+            channel_names = cached["channel_names"]
+        self._channel_names = channel_names  # expected by parent
         self._channel_units = {
             k: "V" for k in self._channel_names
         }  # expected by parent
 
         # check channel ranges are valid
-        self.ranges = self._get_voltage_ranges()
+        if cached is None:
+            self.ranges = self._get_voltage_ranges()
+        else:
+            self.ranges = cached["ranges"]
         is_similar_to_valid = (
             lambda x: x in self.ranges
         )  # [all(np.isclose(x, r)) for r in self.ranges]
@@ -124,15 +947,90 @@ class NiDaqmxTmux(HasMeasureTrigger, IsSensor, IsDaemon):
             raise ValueError()
 
         # finish
-        self._stale_task = True
-        self._create_sample_correspondances()
-        self._create_task()
+        self._stale_task = True  # virtual channels must be rebuilt
+        self._stale_timing = True  # sample clock timing must be reissued
+        self._task_key = None
+        self._sample_dtype = np.int16 if self._config["read_binary"] else np.float64
+        self._scaling_coefficients = None  # of raw codes, when read_binary is set
+        self._ring = None
+        self._reader = None
+        self._prefetch = None  # acquisition of the next looped measurement
+        self._task_lock = threading.Lock()  # serializes use of the DAQmx task
+        self._shared_samples = None  # samples handed to a processing worker process
+        self._pool = BufferPool()
+        self._timing_stats = TimingStats(self._config["timing_window"])
+        self._acquisition_retries = 0  # failed reads, retried or restarted
+        self._statistics = RunningStatistics(self._config["statistics_window"])
+        self._acquisition_error: Optional[str] = None  # of the last measurement
+        self._samples = None
+        self._shots = None
+        self._records = 1  # acquired by the next measurement, set by measure_batch
+        self._measured_batch: Dict[str, np.ndarray] = {}
+        self._adaptive: Optional[tuple] = None  # channel, relative error, max shots
+        self._recorder: Optional[Recorder] = None
+        self._finishing: Dict[pathlib.Path, asyncio.Future] = {}  # stopped recorders
+        self._publisher = None  # of samples and shots to local clients
+        self._publishing: Optional[asyncio.Future] = None  # copy in progress
+        self._pending_publication: Optional[tuple] = None  # next one to copy
+        if self._config["shared_memory"]:
+            self._publisher = SharedMemoryPublisher()
+        if self._config["processing_executor"] == "thread":
+            self._processing_executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix=f"{self.name}-processing"
+            )
+        elif self._config["processing_executor"] == "process":
+            self._processing_executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=1
+            )
+        else:
+            self._processing_executor = None
+        if cached is None:
+            self._create_sample_correspondances()
+        else:
+            self._plan = cached["plan"]
+            self._plan.correspondances.setflags(write=False)
+            self._sample_correspondances = self._plan.correspondances
+        if cache is not None and cached is None:
+            entry = {
+                "channel_names": channel_names,
+                "ranges": self.ranges,
+                "plan": self._plan,
+            }
+            try:
+                cache.store(key, entry)
+            except OSError as err:
+                self.logger.warning(f"could not cache startup artifacts: {err}")
+        if self._config["build_task_in_background"]:
+            # clients are answered meanwhile, measurements wait for the task lock
+            building = self._loop.run_in_executor(None, self._build_task)
+            building.add_done_callback(self._on_task_built)
+        else:
+            self._create_task()
 
-    def _get_voltage_ranges(self) -> List[Tuple[float, float]]:
-        import PyDAQmx  # type: ignore
+    def _build_task(self):
+        with self._task_lock:
+            self._update_task()
+
+    def _on_task_built(self, future):
+        if not future.cancelled() and future.exception() is not None:
+            # the next measurement builds the task again
+            self.logger.error(f"could not build task: {future.exception()!r}")
 
+    def _get_device_identity(self) -> List[str]:
+        """Product type and serial number of the device, which change if swapped."""
+        daqmx = self._daqmx
+        product_type = ctypes.create_string_buffer(256)
+        daqmx.GetDevProductType(
+            self._config["device_name"], product_type, len(product_type)
+        )
+        serial_number = daqmx.uInt32()
+        daqmx.GetDevSerialNum(self._config["device_name"], daqmx.byref(serial_number))
+        return [product_type.value.decode(), str(serial_number.value)]
+
+    def _get_voltage_ranges(self) -> List[Tuple[float, float]]:
+        daqmx = self._daqmx
         data = (ctypes.c_double * 40)()
-        PyDAQmx.GetDevAIVoltageRngs(self._config["device_name"], data, len(data))
+        daqmx.GetDevAIVoltageRngs(self._config["device_name"], data, len(data))
         # data = (-0.1, 0.1, -0.2, 0.2, ..., -10.0, 10.0, 0.0, 0.0, ...)
         ranges = [
             (data[i], data[i + 1])
@@ -145,54 +1043,39 @@ class NiDaqmxTmux(HasMeasureTrigger, IsSensor, IsDaemon):
         return ranges
 
     def _create_sample_correspondances(self):
-        self._sample_correspondances = np.zeros(self._config["nsamples"])
-        # channels
-        for sample_index in range(self._config["nsamples"]):
-            channel_idxs = (
-                []
-            )  # contains indicies of all channels that want to read at this sample
-            for channel_index, channel in enumerate(self._channels):
-                if not channel.enabled:
-                    continue
-                if (
-                    channel.signal_start - channel.signal_presample
-                    < sample_index
-                    < channel.signal_stop
-                ):
-                    channel_idxs.append(channel_index + 1)
-                if channel.use_baseline and (
-                    channel.baseline_start - channel.baseline_presample
-                    < sample_index
-                    < channel.baseline_stop
-                ):
-                    channel_idxs.append(channel_index + 1)
-            if len(channel_idxs) == 1:
-                self._sample_correspondances[sample_index] = channel_idxs[0]
-            elif len(channel_idxs) > 1:
-                self._sample_correspondances[sample_index] = channel_idxs[
-                    sample_index % len(channel_idxs)
-                ]
-        # choppers
-        for chopper_index, chopper in enumerate(self._choppers):
-            if not chopper.enabled:
-                continue
-            self._sample_correspondances[chopper.index] = -chopper_index - 1
+        self._plan = plan_acquisition(
+            self._config["nsamples"],
+            self._channels,
+            self._choppers,
+            compact=self._config["read_binary"],
+        )
+        self._sample_correspondances = self._plan.correspondances
 
-    def _create_task(self):
-        import PyDAQmx  # type: ignore
+    def _update_task(self):
+        """Bring the task up to date, rebuilding virtual channels only if needed."""
+        if self._stale_task or not task_acquires(self._task_key, self._plan):
+            self._create_task()
+        elif self._stale_timing:
+            self._configure_timing()
 
+    def _create_task(self):
+        daqmx = self._daqmx
+        start = time.perf_counter()
+        # settings may change meanwhile, the task is built from this plan only
+        plan = self._plan
         # ensure previous task closed
+        self._stop_continuous()
         if hasattr(self, "_task_handle"):
-            PyDAQmx.DAQmxStopTask(self._task_handle)
-            PyDAQmx.DAQmxClearTask(self._task_handle)
+            daqmx.DAQmxStopTask(self._task_handle)
+            daqmx.DAQmxClearTask(self._task_handle)
         # create task
         try:
-            self._task_handle = PyDAQmx.TaskHandle()
-            self._read = PyDAQmx.int32()  # ??? --BJT 2017-06-03
-            PyDAQmx.DAQmxCreateTask("", PyDAQmx.byref(self._task_handle))
-        except PyDAQmx.DAQError as err:
-            PyDAQmx.DAQmxStopTask(self._task_handle)
-            PyDAQmx.DAQmxClearTask(self._task_handle)
+            self._task_handle = daqmx.TaskHandle()
+            self._read = daqmx.int32()  # ??? --BJT 2017-06-03
+            daqmx.DAQmxCreateTask("", daqmx.byref(self._task_handle))
+        except daqmx.DAQError as err:
+            daqmx.DAQmxStopTask(self._task_handle)
+            daqmx.DAQmxClearTask(self._task_handle)
             return
         # initialize channels
         # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
@@ -215,7 +1098,7 @@ class NiDaqmxTmux(HasMeasureTrigger, IsSensor, IsDaemon):
             # positive : channel
             # negative : chopper
             name_index = 0  # something to keep channel names unique
-            for correspondance in list(self._sample_correspondances):
+            for correspondance in list(plan.correspondances):
                 correspondance = int(correspondance)
                 if correspondance == 0:
                     physical_channel = (
@@ -246,47 +1129,185 @@ class NiDaqmxTmux(HasMeasureTrigger, IsSensor, IsDaemon):
                     min_voltage = -10.0
                     max_voltage = 10.0
                 channel_name = "sample_" + str(name_index).zfill(3)
-                PyDAQmx.DAQmxCreateAIVoltageChan(
+                daqmx.DAQmxCreateAIVoltageChan(
                     self._task_handle,  # task handle
                     physical_channel,  # physical channel
                     channel_name,  # name to assign to channel
-                    PyDAQmx.DAQmx_Val_Diff,  # the input terminal configuration
+                    daqmx.DAQmx_Val_Diff,  # the input terminal configuration
                     min_voltage,
                     max_voltage,
-                    PyDAQmx.DAQmx_Val_Volts,  # units
+                    daqmx.DAQmx_Val_Volts,  # units
                     None,  # reserved
                 )
                 name_index += 1
-        except PyDAQmx.DAQError as err:
+        except daqmx.DAQError as err:
             print(err)
-            PyDAQmx.DAQmxStopTask(self._task_handle)
-            PyDAQmx.DAQmxClearTask(self._task_handle)
+            daqmx.DAQmxStopTask(self._task_handle)
+            daqmx.DAQmxClearTask(self._task_handle)
             return
-        # define timing
+        if self._config["read_binary"]:
+            self._read_scaling_coefficients()
+        self._task_key = plan.task_key
+        if self._plan is plan:
+            self._stale_task = False  # otherwise rebuilt at the next measurement
+        self.logger.info(
+            f"created task with {name_index} virtual channels in "
+            f"{time.perf_counter() - start:.3f} s"
+        )
+        self._configure_timing()
+
+    def _read_scaling_coefficients(self):
+        daqmx = self._daqmx
+        # one row of polynomial coefficients per virtual channel
+        coefficients = np.zeros((self._config["nsamples"], 4))
+        for index, row in enumerate(coefficients):
+            daqmx.DAQmxGetAIDevScalingCoeff(
+                self._task_handle, "sample_" + str(index).zfill(3), row, len(row)
+            )
+        self._scaling_coefficients = coefficients
+
+    def _configure_timing(self):
+        daqmx = self._daqmx
+        start = time.perf_counter()
+        nshots = int(self._state["nshots"]) * self._records
+        continuous = self._config["acquisition_mode"] == "continuous"
+        if continuous:
+            reading = self._reader is not None and not self._ring.closed
+            if reading and self._ring.capacity >= 2 * nshots:
+                # task keeps running, ring buffer is large enough
+                self._task_nshots = nshots
+                self._stale_timing = False
+                return
+            self._stop_continuous()
+            # samples per channel sets the DAQmx buffer size in continuous mode
+            buffer_shots = max(self._config["continuous_buffer_shots"], 2 * nshots)
         try:
-            PyDAQmx.DAQmxCfgSampClkTiming(
+            daqmx.DAQmxCfgSampClkTiming(
                 self._task_handle,  # task handle
                 "/"
                 + self._config["device_name"]
                 + "/"
                 + self._config["trigger_source"],  # sorce terminal
                 1000.0,  # sampling rate (samples per second per channel) (float 64) (in externally clocked mode, only used to initialize buffer)
-                PyDAQmx.DAQmx_Val_Rising,  # acquire samples on the rising edges of the sample clock
-                PyDAQmx.DAQmx_Val_FiniteSamps,  # acquire a finite number of samples
-                int(self._state["nshots"]),  # samples per channel to acquire
+                daqmx.DAQmx_Val_Rising,  # acquire samples on the rising edges of the sample clock
+                (
+                    daqmx.DAQmx_Val_ContSamps
+                    if continuous
+                    else daqmx.DAQmx_Val_FiniteSamps
+                ),
+                (
+                    buffer_shots if continuous else nshots
+                ),  # samples per channel to acquire
             )
-        except PyDAQmx.DAQError as err:
-            PyDAQmx.DAQmxStopTask(self._task_handle)
-            PyDAQmx.DAQmxClearTask(self._task_handle)
+        except daqmx.DAQError as err:
+            daqmx.DAQmxStopTask(self._task_handle)
+            daqmx.DAQmxClearTask(self._task_handle)
+            self._stale_task = True
             return
-        self._stale_task = False
+        if continuous:
+            self._start_continuous(buffer_shots)
+        self._task_nshots = nshots
+        self._stale_timing = False
+        self.logger.debug(
+            f"configured timing for {nshots} shots in "
+            f"{1e3 * (time.perf_counter() - start):.1f} ms"
+        )
+
+    def _start_continuous(self, capacity):
+        daqmx = self._daqmx
+        self._ring = RingBuffer(self._config["nsamples"], capacity, self._sample_dtype)
+        self._reader_stop = threading.Event()
+        daqmx.DAQmxStartTask(self._task_handle)
+        self._reader = threading.Thread(
+            target=self._read_continuous, args=(self._ring,), daemon=True
+        )
+        self._reader.start()
+
+    def _stop_continuous(self):
+        daqmx = self._daqmx
+        if self._reader is None:
+            return
+        self._reader_stop.set()
+        daqmx.DAQmxStopTask(self._task_handle)  # aborts a blocking read
+        self._reader.join()
+        self._reader = None
+        self._ring.close()
+
+    def _read_continuous(self, ring):
+        """Run in the reader thread, moving chunks of shots into the ring buffer."""
+        daqmx = self._daqmx
+        nsamples = self._config["nsamples"]
+        chunk = min(self._config["continuous_chunk_shots"], ring.capacity)
+        buffer = np.empty(chunk * nsamples, dtype=self._sample_dtype)
+        read = daqmx.int32()
+        while not self._reader_stop.is_set():
+            try:
+                self._read_into(buffer, chunk, self._config["timeout"], read)
+            except daqmx.DAQError as err:
+                if self._reader_stop.is_set():
+                    break
+                # most often a buffer overflow or a missing trigger
+                self.logger.error(f"continuous acquisition stopped: {err}")
+                ring.close()  # before the restart it asks for, which checks it
+                self._stale_timing = True
+                break
+            ring.write(buffer.reshape((nsamples, -1), order="F")[:, : read.value])
+        ring.close()
+
+    def close(self):
+        recorder, self._recorder = self._recorder, None
+        if recorder is not None:
+            self._finish_recording(recorder)
+        self._discard_prefetch()
+        with self._task_lock:
+            self._stop_continuous()
+        if self._processing_executor is not None:
+            self._processing_executor.shutdown(wait=False, cancel_futures=True)
+        self._close_shared_samples()
+        publisher, self._publisher = self._publisher, None
+        if publisher is not None:
+            publisher.close()  # after any copy in progress
+
+    def _check_measured(self):
+        if self._samples is None:
+            raise RuntimeError("nothing measured yet")
 
     def get_measured_samples(self):
+        self._check_measured()
+        if self._samples.dtype == np.int16:
+            # raw codes are only scaled on request
+            return scale_samples(self._samples, self._scaling_coefficients)
         return self._samples
 
     def get_measured_shots(self):
+        self._check_measured()
         return self._shots
 
+    def get_measured_samples_for_shots(self, shots: List[int]) -> np.ndarray:
+        self._check_measured()
+        samples = self._samples[:, shots]
+        if samples.dtype == np.int16:
+            return scale_samples(samples, self._scaling_coefficients)
+        return samples
+
+    def get_measured_shots_row(self, name: str) -> np.ndarray:
+        self._check_measured()
+        return self._shots[self._shot_names.index(name)]
+
+    def get_measured_shots_envelope(self, name: str, bins: int) -> np.ndarray:
+        return shot_envelope(self.get_measured_shots_row(name), bins)
+
+    def get_measured_samples_statistics(self) -> np.ndarray:
+        samples = self.get_measured_samples()
+        return np.stack(
+            [
+                samples.mean(axis=1),
+                samples.std(axis=1),
+                samples.min(axis=1),
+                samples.max(axis=1),
+            ]
+        )
+
     def get_nshots(self):
         return self._state["nshots"]
 
@@ -296,64 +1317,256 @@ class NiDaqmxTmux(HasMeasureTrigger, IsSensor, IsDaemon):
     def get_sample_correspondances(self):
         return self._sample_correspondances
 
-    async def _measure(self):
-        await asyncio.sleep(self._state["ms_wait"] / 1000.0)
-        # this method runs synchronously
+    def get_channel(self, channel: str) -> Dict[str, Any]:
+        index = self._channel_index(channel)
+        return self._config["channels"][self._channels[index].physical_channel]
+
+    def set_channel_window(
+        self, channel: str, kind: str, start: int, stop: int, presample: int = 0
+    ):
+        """Set the signal or baseline window of a channel."""
+        if kind not in ("signal", "baseline"):
+            raise ValueError(f"kind must be signal or baseline, not {kind}")
+        changes = {
+            f"{kind}_start": start,
+            f"{kind}_stop": stop,
+            f"{kind}_presample": presample,
+        }
+        candidate = replace(self._channels[self._channel_index(channel)], **changes)
+        _check_window(candidate, kind, self._config["nsamples"])
+        self._set_channel(channel, **changes)
+
+    def set_channel_method(self, channel: str, kind: str, method: str):
+        """Set the processing method of the signal or baseline window of a channel."""
+        if kind not in ("signal", "baseline"):
+            raise ValueError(f"kind must be signal or baseline, not {kind}")
+        if method not in _reducers:
+            raise ValueError(f"method must be one of {list(_reducers)}")
+        self._set_channel(channel, **{f"{kind}_method": method})
+
+    def set_channel_use_baseline(self, channel: str, use_baseline: bool):
+        if use_baseline:
+            candidate = self._channels[self._channel_index(channel)]
+            _check_window(candidate, "baseline", self._config["nsamples"])
+        self._set_channel(channel, use_baseline=use_baseline)
+
+    def set_channel_invert(self, channel: str, invert: bool):
+        self._set_channel(channel, invert=invert)
+
+    def _channel_index(self, name) -> int:
+        for index, channel in enumerate(self._channels):
+            if channel.name == name:
+                return index
+        raise KeyError(f"no channel named {name}")
+
+    def _set_channel(self, name, **changes):
+        """Change settings of a channel, effective from the next measurement.
+
+        Only the acquisition plan is recompiled, unless samples move between physical
+        channels, which requires rebuilding the task.
+        """
+        index = self._channel_index(name)
+        previous = self._channels[index]
+        self._channels[index] = replace(previous, **changes)
+        try:
+            self._create_sample_correspondances()
+        except Exception:
+            self._channels[index] = previous
+            raise
+        self._config["channels"][previous.physical_channel].update(changes)
+        if not task_acquires(self._task_key, self._plan):
+            self._stale_task = True  # also discards a prefetched acquisition
+            self.logger.info(f"rebuilding task for new settings of {name}")
+
+    async def _acquire(self, pending=None, following=False):
+        """Acquire samples, first awaiting an already submitted read if given.
+
+        In continuous acquisition, following reads the shots after those already
+        written, also when continuous_read is latest.
+        """
+        if pending is None:
+            start = time.perf_counter()
+            await asyncio.sleep(self._state["ms_wait"] / 1000.0)
+            self._timing_stats.record("ms_wait", time.perf_counter() - start)
+        # exponential backoff for retrying measurement, waits can be cancelled
+        waits = iter(np.geomspace(0.01, 60, 10))
         while True:
-            samples = await self._loop.run_in_executor(None, self._measure_samples)
-            if not self._stale_task:
-                break
+            if pending is None:
+                pending = self._loop.run_in_executor(
+                    None, self._measure_samples, following
+                )
+            try:
+                samples = await pending
+            except AcquisitionError as err:
+                wait = next(waits, None)
+                if wait is None:
+                    raise
+                self._acquisition_retries += 1
+                self.logger.warning(f"{err}, retrying in {wait:.2f} s")
+                await asyncio.sleep(wait)
+                continue
+            finally:
+                pending = None
+            if samples is not None and not (self._stale_task or self._stale_timing):
+                return samples
+            self._pool.release(samples)
 
-        shots = np.empty(
-            [
-                len(self._raw_channel_names)
-                + len([c for c in self._choppers if c.enabled]),
-                self._state["nshots"],
-            ]
+    def _start_prefetch(self):
+        pending = None
+        if not self._state["ms_wait"]:
+            # submit the read right away, processing is about to hold the event loop
+            pending = self._loop.run_in_executor(None, self._measure_samples)
+        self._prefetch = self._loop.create_task(self._acquire(pending))
+
+    def _discard_prefetch(self):
+        if self._prefetch is not None:
+            self._prefetch.cancel()
+            self._prefetch = None
+
+    def _dry_run_processing(self, module) -> List[str]:
+        """Output channel names of shots processing, run on zeros."""
+        shots = np.zeros((len(self._shot_names), self._state["nshots"]))
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            outs = process_records(
+                module,
+                shots,
+                self._shot_names,
+                self._shot_kinds,
+                phase_channels=self._config["chopper_phase_channels"],
+            )
+        return list(outs[0][1])
+
+    def _reload_processing_module(self):
+        """Swap in shots processing if its file changed, keeping the same outputs."""
+        path = pathlib.Path(self._config["shots_processing_path"])
+        try:
+            mtime = path.stat().st_mtime_ns
+        except OSError:
+            return
+        if mtime == self._processing_mtime:
+            return
+        self._processing_mtime = mtime  # a broken file is retried once changed again
+        try:
+            source = path.read_text()
+            module = load_processing_module(path, source)
+            names = self._dry_run_processing(module)
+        except Exception as err:
+            self.logger.error(f"keeping previous shots processing: {err!r}")
+            return
+        if names != list(self._channel_names):
+            self.logger.error(
+                f"keeping previous shots processing: outputs {names} differ from "
+                f"{list(self._channel_names)}, restart the daemon to change them"
+            )
+            return
+        self.processing_module = module
+        self._processing_source = source
+        self.logger.info(f"reloaded shots processing from {path}")
+
+    async def _process(self, samples, records=1):
+        """Run process_measurement on the configured processing executor."""
+        if self._config["shots_processing_reload"]:
+            self._reload_processing_module()
+        args = (self._plan, samples, self._scaling_coefficients)
+        args += (self.processing_module, self._shot_names, self._shot_kinds, records)
+        args += (self._config["chopper_phase_channels"],)
+        if self._config["processing_executor"] == "event_loop":
+            return process_measurement(*args)
+        if self._config["processing_executor"] == "thread":
+            return await self._loop.run_in_executor(
+                self._processing_executor, process_measurement, *args
+            )
+        # worker process, samples are passed through shared memory
+        start = time.perf_counter()
+        if self._shared_samples is None or self._shared_samples.size < samples.nbytes:
+            self._close_shared_samples()
+            self._shared_samples = shared_memory.SharedMemory(
+                create=True, size=samples.nbytes
+            )
+        shared = np.ndarray(
+            samples.shape,
+            dtype=samples.dtype,
+            buffer=self._shared_samples.buf,
+            order="F",
         )
-        # channels
-        i = 0
-        for channel_index, channel in enumerate(self._channels):
-            if not channel.enabled:
-                continue
-            # signal
-            idxs = self._sample_correspondances == channel_index + 1
-            idxs[channel.signal_stop + 1 :] = False
-            signal_samples = samples[idxs]
-            signal_shots = process_samples(channel.signal_method, signal_samples)
-            # baseline
-            if not channel.use_baseline:
-                baseline_shots = 0
-            else:
-                idxs = self._sample_correspondances == channel_index + 1
-                idxs[: channel.signal_stop + 1] = False
-                baseline_samples = samples[idxs]
-                baseline_shots = process_samples(
-                    channel.baseline_method, baseline_samples
+        shared[:] = samples
+        del shared  # release the exported buffer, so the segment can be closed
+        shots, outs, timings = await self._loop.run_in_executor(
+            self._processing_executor,
+            _process_in_worker,
+            str(self._config["shots_processing_path"]),
+            self._processing_source,
+            self._plan,
+            self._shared_samples.name,
+            samples.shape,
+            samples.dtype,
+            self._scaling_coefficients,
+            self._shot_names,
+            self._shot_kinds,
+            records,
+            self._config["chopper_phase_channels"],
+        )
+        timings["transfer"] = time.perf_counter() - start - sum(timings.values())
+        return shots, outs, timings
+
+    def _close_shared_samples(self):
+        if self._shared_samples is not None:
+            self._shared_samples.close()
+            self._shared_samples.unlink()
+            self._shared_samples = None
+
+    async def _measure(self):
+        start = time.perf_counter()
+        records = self._records
+        adaptive, self._adaptive = self._adaptive, None
+        prefetch, self._prefetch = self._prefetch, None
+        samples = None
+        try:
+            if prefetch is not None:
+                samples = await prefetch
+                if self._stale_task or self._stale_timing:
+                    # acquired with outdated settings
+                    self._pool.release(samples)
+                    samples = None
+            if samples is None:
+                samples = await self._acquire()
+        except AcquisitionError as err:
+            return self._fail_measurement(err, records)
+        self._acquisition_error = None
+        if records > 1:
+            # following measurements are single records again
+            self._records = 1
+            self._stale_timing = True
+        if self._looping:
+            # acquire the next measurement while this one is processed
+            self._start_prefetch()
+
+        acquired = time.perf_counter()
+        shots, outs, timings = await self._process(samples, records)
+        timings["acquire"] = acquired - start
+        out = outs[-1]  # measured values are those of the last record
+        if adaptive is not None:
+            try:
+                samples, shots, outs = await self._measure_adaptively(
+                    *adaptive, samples, shots, outs
                 )
-            # math
-            shots[i] = signal_shots - baseline_shots
-            if channel.invert:
-                shots[i] *= -1
-            i += 1
-        # choppers
-        for chopper in self._choppers:
-            if not chopper.enabled:
-                continue
-            cutoff = 1.0  # volts
-            out = samples[chopper.index]
-            out[out <= cutoff] = -1.0
-            out[out > cutoff] = 1.0
-            if chopper.invert:
-                out *= -1
-            shots[i] = out
-            i += 1
-        # process
-        kinds = ["channel" for _ in self._raw_channel_names] + [
-            "chopper" for c in self._choppers if c.enabled
-        ]
-        names = self._raw_channel_names + [c.name for c in self._choppers if c.enabled]
-        out = self.processing_module.process(shots, names, kinds)
+            except AcquisitionError as err:
+                return self._fail_measurement(err)
+            out = (np.mean([o[0] for o in outs], axis=0), *out[1:])
+            timings["adaptive"] = time.perf_counter() - start - sum(timings.values())
+        if not self._looping:
+            # looping ended while processing, the prefetched samples would go stale
+            self._discard_prefetch()
+        timings["total"] = time.perf_counter() - start
+        self._timing_stats.update(timings)
+        self.logger.debug(
+            "stage latency: "
+            + ", ".join(f"{k} {1e3 * v:.1f} ms" for k, v in timings.items())
+        )
+        interval = self._config["timing_log_interval"]
+        if interval and (self._measurement_id + 1) % interval == 0:
+            self._log_timing_stats()
         if len(out) == 3:
             out, out_names, out_signed = out
         else:
@@ -361,63 +1574,361 @@ class NiDaqmxTmux(HasMeasureTrigger, IsSensor, IsDaemon):
             out_signed = False
         # finish
         self._channel_names = out_names
+        self._pool.release(self._samples)  # previous snapshot is no longer published
         self._samples = samples
         self._shots = shots
+        self._measured_batch = {
+            k: np.array(v) for k, v in zip(out_names, zip(*(o[0] for o in outs)))
+        }
+        for o in outs:
+            self._statistics.update(dict(zip(o[1], o[0])))
+        if self._recorder is not None:
+            self._pool.retain(samples)  # released by the recorder once written
+            self._recorder.record(self._measurement_id + 1, samples, shots)
+        if self._publisher is not None:
+            self._publish(samples, shots, self._scaling_coefficients)
         out = {k: v for k, v in zip(self._channel_names, out)}
         return out
 
-    def _measure_samples(self):
-        import PyDAQmx  # type: ignore
+    def _publish(self, samples, shots, coefficients=None):
+        """Copy a measurement to shared memory from the default executor.
+
+        A measurement arriving while the previous one is copied waits for it, and is
+        superseded by any newer one meanwhile.
+        """
+        self._pool.retain(samples)  # released once copied
+        publication = (self._measurement_id + 1, samples, shots, coefficients)
+        superseded, self._pending_publication = self._pending_publication, publication
+        if superseded is not None:
+            self._pool.release(superseded[1])
+        if self._publishing is None or self._publishing.done():
+            self._start_publishing()
+
+    def _start_publishing(self):
+        publication, self._pending_publication = self._pending_publication, None
+        if publication is None or self._publisher is None:
+            return
+
+        def published(future):
+            self._pool.release(publication[1])
+            if not future.cancelled() and future.exception() is not None:
+                self.logger.error(f"could not publish: {future.exception()!r}")
+            self._start_publishing()
 
-        samples = np.zeros(
-            int(self._state["nshots"] * self._config["nsamples"]), dtype=np.float64
+        self._publishing = self._loop.run_in_executor(
+            None, self._publisher.publish, *publication
         )
-        for wait in np.geomspace(
-            0.01, 60, 10
-        ):  # exponential backoff for retrying measurement
-            try:
-                self._read = PyDAQmx.int32()
-                PyDAQmx.DAQmxStartTask(self._task_handle)
-                PyDAQmx.DAQmxReadAnalogF64(
-                    self._task_handle,  # task handle
-                    int(self._state["nshots"]),  # number of samples per channel
-                    self._config[
-                        "timeout"
-                    ],  # timeout (seconds) for each read operation
-                    PyDAQmx.DAQmx_Val_GroupByScanNumber,  # fill mode
-                    samples,  # read array
-                    len(
-                        samples
-                    ),  # size of the array, in samples, into which samples are read
-                    PyDAQmx.byref(self._read),  # reference of thread
-                    None,  # reserved by NI
-                )
-                PyDAQmx.DAQmxStopTask(self._task_handle)
-            except PyDAQmx.DAQError as err:
-                print(err)
-                PyDAQmx.DAQmxStopTask(self._task_handle)
-                time.sleep(wait)
+        self._publishing.add_done_callback(published)
+
+    async def _measure_adaptively(
+        self, channel, relative_error, max_shots, samples, shots, outs
+    ):
+        """Acquire further chunks of nshots, with the task and timing as they are.
+
+        Stops once the mean of channel over chunks has a standard error within
+        relative_error of its magnitude, or before exceeding max_shots. Returns
+        samples and shots of every chunk, one after the other, and the output of
+        each chunk.
+        """
+        chunks = [(samples, shots)]
+        nshots = shots.shape[1]
+        try:
+            while (len(outs) + 1) * nshots <= max_shots:
+                if len(outs) > 1:
+                    values = [o[0][list(o[1]).index(channel)] for o in outs]
+                    sem = np.std(values, ddof=1) / np.sqrt(len(values))
+                    if sem <= relative_error * np.abs(np.mean(values)):
+                        break
+                # chunks must not repeat the latest shots of the ring buffer
+                samples = await self._acquire(following=True)
+                chunks.append((samples, None))
+                shots, chunk_outs, _ = await self._process(samples)
+                chunks[-1] = (samples, shots)
+                outs = outs + chunk_outs
+        except BaseException:
+            for chunk, _ in chunks:
+                self._pool.release(chunk)
+            raise
+        if len(chunks) == 1:
+            return samples, shots, outs
+        samples = self._pool.acquire(
+            (samples.shape[0], nshots * len(chunks)), samples.dtype
+        )
+        for i, (chunk, _) in enumerate(chunks):
+            samples[:, i * nshots : (i + 1) * nshots] = chunk
+            self._pool.release(chunk)
+        return samples, np.hstack([c[1] for c in chunks]), outs
+
+    def _fail_measurement(self, err, records=1):
+        """Publish NaN after acquisition gave up, and stop looping."""
+        self.logger.error(f"acquisition failed: {err}")
+        self._acquisition_error = str(err)
+        self._stale_task = True  # rebuild the task before the next attempt
+        self._records = 1
+        self.stop_looping()
+        shape = (self._config["nsamples"], self._state["nshots"] * records)
+        samples = self._pool.acquire(shape, np.float64)
+        samples[:] = np.nan
+        self._pool.release(self._samples)
+        self._samples = samples
+        self._shots = np.full((self._plan.nrows, shape[1]), np.nan)
+        self._measured_batch = {
+            k: np.full(records, np.nan) for k in self._channel_names
+        }
+        if self._publisher is not None:
+            self._publish(samples, self._shots)
+        return {k: np.nan for k in self._channel_names}
+
+    def _measure_samples(self, following=False):
+        with self._task_lock:
+            return self._measure_samples_locked(following)
+
+    def _measure_samples_locked(self, following=False):
+        daqmx = self._daqmx
+        self._update_task()
+        if self._config["acquisition_mode"] == "continuous":
+            return self._measure_samples_continuous(following)
+        nshots = self._task_nshots
+        samples = self._pool.acquire(
+            (self._config["nsamples"], nshots), self._sample_dtype
+        )
+        flat = samples.reshape(-1, order="F")  # a view, samples are Fortran ordered
+        stats = self._timing_stats
+        try:
+            self._read = daqmx.int32()
+            start = time.perf_counter()
+            daqmx.DAQmxStartTask(self._task_handle)
+            armed = time.perf_counter()
+            self._read_finite(flat, nshots)
+            read = time.perf_counter()
+            daqmx.DAQmxStopTask(self._task_handle)
+            stats.record("stop", time.perf_counter() - read)
+            stats.record("read", read - armed)
+            stats.record("arm", armed - start)
+        except daqmx.DAQError as err:
+            daqmx.DAQmxStopTask(self._task_handle)
+            self._pool.release(samples)
+            raise AcquisitionError(str(err)) from err
+        return samples
+
+    def _read_finite(self, flat, nshots):
+        """Read nshots in chunks, failing within a few trigger periods of a stall.
+
+        The first shot is probed with trigger_timeout. Once the trigger period has been
+        measured, each chunk times out after a few periods more than it should take.
+        """
+        nsamples = self._config["nsamples"]
+        chunk = self._config["read_chunk_shots"]
+        latency = 0.05  # seconds, allowed for scheduling and driver overhead
+        timeout = self._config["trigger_timeout"]
+        done = 0
+        while done < nshots:
+            n = 1 if done == 0 else min(chunk, nshots - done)
+            buffer = flat[done * nsamples : (done + n) * nsamples]
+            self._read_into(buffer, n, timeout, self._read)
+            done += n
+            if done == 1:
+                first = time.perf_counter()
+                timeout = self._config["timeout"]  # until the period is known
             else:
-                break
+                period = (time.perf_counter() - first) / (done - 1)
+                timeout = min(self._config["timeout"], latency + (chunk + 5) * period)
+
+    def _read_into(self, buffer, nshots, timeout, read):
+        """Read nshots into buffer, as raw codes if read_binary is set, else volts."""
+        daqmx = self._daqmx
+        if self._config["read_binary"]:
+            read_function = daqmx.DAQmxReadBinaryI16
         else:
-            PyDAQmx.DAQmxClearTask(self._task_handle)
-        samples = samples.reshape((self._config["nsamples"], -1), order="F")
-        if self._stale_task:
-            self._create_task()
-            return self._measure_samples()
+            read_function = daqmx.DAQmxReadAnalogF64
+        read_function(
+            self._task_handle,  # task handle
+            nshots,  # number of samples per channel
+            timeout,  # timeout (seconds) for each read operation
+            daqmx.DAQmx_Val_GroupByScanNumber,  # fill mode
+            buffer,  # read array
+            len(buffer),  # size of the array, in samples, into which samples are read
+            daqmx.byref(read),  # number of samples per channel read
+            None,  # reserved by NI
+        )
+
+    def _measure_samples_continuous(self, following=False):
+        ring = self._ring
+        nshots = self._task_nshots
+        if self._config["continuous_read"] == "latest" and not following:
+            stop = max(ring.written, nshots)
         else:
+            stop = ring.written + nshots
+        start = time.perf_counter()
+        if not ring.wait_for(stop, self._config["trigger_timeout"]):
+            self._stale_timing = True  # restart the task
+            self._stop_continuous()
+            raise AcquisitionError("no shots written to ring buffer")
+        samples = self._pool.acquire((ring.data.shape[0], nshots), ring.data.dtype)
+        try:
+            ring.read(stop, nshots, out=samples)
+            self._timing_stats.record("read", time.perf_counter() - start)
             return samples
+        except BufferError as err:
+            self._pool.release(samples)
+            self.logger.warning(str(err))
+            self._stale_timing = True  # caller will retry
+            return None
+
+    def measure_batch(self, records: int) -> int:
+        """Measure records of nshots each in a single acquisition."""
+        if records < 1:
+            raise ValueError("records must be positive")
+        if self._busy:
+            raise RuntimeError("cannot measure a batch while busy")
+        self._records = records
+        self._stale_timing = True
+        return self.measure(loop=False)
+
+    def measure_adaptive(
+        self, channel: str, relative_error: float, max_shots: int
+    ) -> int:
+        """Measure chunks of nshots until channel is known to relative_error."""
+        if channel not in self._channel_names:
+            raise KeyError(f"no channel named {channel}")
+        if relative_error <= 0:
+            raise ValueError("relative_error must be positive")
+        if self._busy:
+            raise RuntimeError("cannot measure adaptively while busy")
+        self._adaptive = (channel, relative_error, max_shots)
+        return self.measure(loop=False)
+
+    def get_measured_nshots(self) -> int:
+        return 0 if self._shots is None else self._shots.shape[1]
+
+    def get_measured_batch(self) -> Dict[str, np.ndarray]:
+        return self._measured_batch
+
+    def start_recording(self, path: Optional[str] = None) -> str:
+        """Append samples and shots of every following measurement to disk."""
+        if path is None:
+            directory = (
+                platformdirs.user_data_path("yaqd-ni", "yaq")
+                / "recordings"
+                / self.name
+                / time.strftime("%Y%m%dT%H%M%S")
+            )
+        else:
+            directory = pathlib.Path(path)
+        if self._recorder is not None and self._recorder.path == directory:
+            return str(directory)
+        self.stop_recording()
+        if directory in self._finishing:
+            raise RuntimeError(f"still writing queued measurements to {directory}")
+        self._recorder = Recorder(
+            directory,
+            self._config["nsamples"],
+            self._sample_dtype,
+            self._shot_names,
+            coefficients=self._scaling_coefficients,
+            release=self._pool.release,
+        )
+        self.logger.info(f"recording to {self._recorder.path}")
+        return str(self._recorder.path)
+
+    def stop_recording(self):
+        recorder, self._recorder = self._recorder, None
+        if recorder is None:
+            return
+        # queued measurements are written without holding up the event loop
+        future = self._loop.run_in_executor(None, self._finish_recording, recorder)
+        self._finishing[recorder.path] = future
+        future.add_done_callback(lambda _: self._finishing.pop(recorder.path, None))
+
+    def _finish_recording(self, recorder):
+        recorder.close()
+        self.logger.info(
+            f"recorded {recorder.recorded} measurements to {recorder.path}, "
+            f"dropped {recorder.dropped}"
+        )
+
+    def get_shared_memory_info(self) -> Optional[Dict[str, Any]]:
+        if self._publisher is None or self._publisher.name is None:
+            return None
+        return {
+            "name": self._publisher.name,
+            "measurement_id": self._measurement_id,
+            "nsamples": self._samples.shape[0],
+            "nshots": self._samples.shape[1],
+            "nrows": self._shots.shape[0],
+            "dtype": self._samples.dtype.str,
+        }
+
+    def get_recording_path(self) -> Optional[str]:
+        if self._recorder is None:
+            return None
+        return str(self._recorder.path)
 
     def set_nshots(self, nshots):
         """Set number of shots."""
         assert nshots > 0
         self._state["nshots"] = nshots
-        self._stale_task = True
+        self._stale_timing = True
+
+    def measure(self, loop: bool = False) -> int:
+        if not loop:
+            # a prefetched acquisition would be stale by the next measurement
+            self._discard_prefetch()
+        return super().measure(loop)
+
+    def stop_looping(self):
+        super().stop_looping()
+        # a prefetched acquisition would be stale by the next measurement
+        self._discard_prefetch()
 
     def set_ms_wait(self, ms_wait):
         """Set number of shots."""
         self._state["ms_wait"] = ms_wait
 
+    def get_timing_stats(self) -> Dict[str, Dict[str, float]]:
+        return self._timing_stats.summary()
+
+    def reset_timing_stats(self):
+        self._timing_stats.clear()
+        self._acquisition_retries = 0
+
+    def get_statistics(self) -> Dict[str, Dict[str, float]]:
+        out = self._statistics.summary()
+        if self._shots is None:
+            return out
+        # spread of shots within the latest measurement, computed when asked
+        nchannels = self._shot_kinds.count("channel")
+        shots = self._shots[:nchannels]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = shots.mean(axis=1)
+            std = shots.std(axis=1, ddof=1) if shots.shape[1] > 1 else mean * np.nan
+            snr = np.abs(mean) / std
+        for name, m, s, r in zip(self._shot_names, mean, std, snr):
+            stats = out.setdefault(name, {})
+            stats.update(shot_mean=float(m), shot_std=float(s), shot_snr=float(r))
+        return out
+
+    def reset_statistics(self):
+        self._statistics.clear()
+
+    def get_acquisition_retries(self) -> int:
+        return self._acquisition_retries
+
+    def get_acquisition_error(self) -> Optional[str]:
+        return self._acquisition_error
+
+    def _log_timing_stats(self):
+        summary = self._timing_stats.summary()
+        measurements = min(summary["total"]["count"], self._timing_stats.window)
+        self.logger.info(
+            f"timing over the last {measurements:.0f} measurements, "
+            f"{self._acquisition_retries} retries: "
+            + ", ".join(
+                f"{k} mean {v['mean']:.1f} p99 {v['p99']:.1f} max {v['max']:.1f} ms"
+                for k, v in summary.items()
+            )
+        )
+
     def get_allowed_voltage_ranges(self) -> List[str]:
         # stringify items to prevent floating point miscommunications
         return list(map(str, self.ranges))
@@ -0,0 +1,162 @@
+"""Append-only on-disk store of measured samples and shots.
+
+A recording is a directory holding
+
+- samples.bin, raw samples of every measurement, each Fortran ordered (sample, shot)
+- shots.bin, float64 shots of every measurement, each C ordered (row, shot)
+- index.bin, one INDEX_DTYPE entry per measurement locating its data
+- meta.json, nsamples, dtype, shot names and, for raw codes, scaling coefficients
+
+Data is written before its index entry, so every indexed measurement is complete.
+"""
+
+__all__ = ["Recorder", "Recording", "INDEX_DTYPE"]
+
+
+import contextlib
+import json
+import pathlib
+import queue
+import threading
+import time
+from typing import Callable, Optional
+
+import numpy as np  # type: ignore
+
+INDEX_DTYPE = np.dtype(
+    [
+        ("measurement_id", "<i8"),
+        ("time", "<f8"),  # seconds since the epoch
+        ("nshots", "<i8"),
+        ("samples_offset", "<i8"),
+        ("shots_offset", "<i8"),
+    ]
+)
+
+
+class Recorder:
+    """Write measurements to a recording from a background thread.
+
+    Measurements are queued without blocking, and dropped if the queue is full.
+    Samples are handed back through release once written.
+    """
+
+    def __init__(
+        self,
+        path,
+        nsamples,
+        dtype,
+        names,
+        coefficients=None,
+        release: Optional[Callable] = None,
+        max_queued=16,
+    ):
+        self.path = pathlib.Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        meta = {
+            "nsamples": int(nsamples),
+            "dtype": np.dtype(dtype).str,
+            "names": list(names),
+            "coefficients": None if coefficients is None else coefficients.tolist(),
+        }
+        meta_path = self.path / "meta.json"
+        if meta_path.exists():
+            existing = json.loads(meta_path.read_text())
+            if existing != meta:
+                raise ValueError(f"{self.path} holds a recording of other settings")
+        else:
+            meta_path.write_text(json.dumps(meta))
+        self.recorded = 0
+        self.dropped = 0
+        self._release = release or (lambda samples: None)
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queued)
+        self._thread = threading.Thread(
+            target=self._write_all, name=f"recorder-{self.path.name}", daemon=True
+        )
+        self._thread.start()
+
+    def record(self, measurement_id, samples, shots) -> bool:
+        """Queue a measurement, returning False if it was dropped."""
+        try:
+            self._queue.put_nowait((measurement_id, time.time(), samples, shots))
+        except queue.Full:
+            self.dropped += 1
+            self._release(samples)
+            return False
+        return True
+
+    def close(self):
+        """Write every queued measurement, then stop."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _write_all(self):
+        with contextlib.ExitStack() as stack:
+            samples_file = stack.enter_context(open(self.path / "samples.bin", "ab"))
+            shots_file = stack.enter_context(open(self.path / "shots.bin", "ab"))
+            index_file = stack.enter_context(open(self.path / "index.bin", "ab"))
+            while (item := self._queue.get()) is not None:
+                measurement_id, timestamp, samples, shots = item
+                try:
+                    entry = np.zeros(1, dtype=INDEX_DTYPE)
+                    entry["measurement_id"] = measurement_id
+                    entry["time"] = timestamp
+                    entry["nshots"] = samples.shape[1]
+                    entry["samples_offset"] = samples_file.tell()
+                    entry["shots_offset"] = shots_file.tell()
+                    # transpose of Fortran ordered samples is C contiguous
+                    samples_file.write(np.asfortranarray(samples).T.data)
+                    shots_file.write(np.ascontiguousarray(shots, np.float64).data)
+                    samples_file.flush()
+                    shots_file.flush()
+                    index_file.write(entry.tobytes())
+                    index_file.flush()
+                    self.recorded += 1
+                finally:
+                    self._release(samples)
+
+
+class Recording:
+    """Random access to a recording by measurement id, through memory maps."""
+
+    def __init__(self, path):
+        self.path = pathlib.Path(path)
+        meta = json.loads((self.path / "meta.json").read_text())
+        self.nsamples = meta["nsamples"]
+        self.dtype = np.dtype(meta["dtype"])
+        self.names = meta["names"]
+        self.coefficients = meta["coefficients"]
+        if self.coefficients is not None:
+            self.coefficients = np.array(self.coefficients)
+        self.index = np.fromfile(self.path / "index.bin", dtype=INDEX_DTYPE)
+        self._rows = {int(i): k for k, i in enumerate(self.index["measurement_id"])}
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def measurement_ids(self) -> np.ndarray:
+        return self.index["measurement_id"]
+
+    def samples(self, measurement_id) -> np.ndarray:
+        """Recorded samples of shape (sample, shot), raw codes if so acquired."""
+        entry = self.index[self._rows[measurement_id]]
+        return np.memmap(
+            self.path / "samples.bin",
+            dtype=self.dtype,
+            mode="r",
+            offset=int(entry["samples_offset"]),
+            shape=(self.nsamples, int(entry["nshots"])),
+            order="F",
+        )
+
+    def shots(self, measurement_id) -> np.ndarray:
+        """Recorded shots of shape (row, shot), rows named by names."""
+        entry = self.index[self._rows[measurement_id]]
+        return np.memmap(
+            self.path / "shots.bin",
+            dtype=np.float64,
+            mode="r",
+            offset=int(entry["shots_offset"]),
+            shape=(len(self.names), int(entry["nshots"])),
+        )
@@ -0,0 +1,172 @@
+"""Latest samples and shots, published to clients on the same machine.
+
+A segment starts with a HEADER_DTYPE header, followed by scaling coefficients of
+shape (sample, coefficient), samples of shape (sample, shot) in Fortran order and
+float64 shots of shape (row, shot). Coefficients are only present for raw codes.
+
+The header generation is odd while the publisher writes, and incremented again once
+the segment is consistent. Readers copy data out and retry if the generation changed
+meanwhile. A segment too small for new data is retired in favor of a new one, whose
+name clients must ask the daemon for again.
+"""
+
+__all__ = ["SharedMemoryPublisher", "SharedMemoryReader", "HEADER_DTYPE"]
+
+
+import os
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Optional, Set
+
+import numpy as np  # type: ignore
+
+_created: Set[str] = set()  # names of segments published by this process
+
+HEADER_DTYPE = np.dtype(
+    [
+        ("generation", "<u8"),
+        ("retired", "<u8"),  # nonzero once replaced by a new segment
+        ("measurement_id", "<i8"),
+        ("nsamples", "<i8"),
+        ("nshots", "<i8"),
+        ("nrows", "<i8"),
+        ("ncoefficients", "<i8"),
+        ("dtype", "S8"),  # of samples
+    ]
+)
+
+
+def _views(buf, header):
+    """Coefficients, samples and shots within a segment, as described by header."""
+    nsamples, nshots = int(header["nsamples"]), int(header["nshots"])
+    dtype = np.dtype(header["dtype"].item().decode())
+    offset = HEADER_DTYPE.itemsize
+    shape = (nsamples, int(header["ncoefficients"]))
+    coefficients = np.ndarray(shape, np.float64, buffer=buf, offset=offset)
+    offset += coefficients.nbytes
+    samples = np.ndarray(
+        (nsamples, nshots), dtype, buffer=buf, offset=offset, order="F"
+    )
+    offset += samples.nbytes
+    shape = (int(header["nrows"]), nshots)
+    shots = np.ndarray(shape, np.float64, buffer=buf, offset=offset)
+    return coefficients, samples, shots
+
+
+class SharedMemoryPublisher:
+    """Copy each measurement into a shared memory segment, growing it as needed."""
+
+    def __init__(self):
+        self._shm: Optional[shared_memory.SharedMemory] = None
+        self._header = None
+        self._lock = threading.Lock()  # publish may run in another thread
+        self.generation = 0
+
+    @property
+    def name(self) -> Optional[str]:
+        return None if self._shm is None else self._shm.name
+
+    def publish(self, measurement_id, samples, shots, coefficients=None):
+        with self._lock:
+            self._publish(measurement_id, samples, shots, coefficients)
+
+    def _publish(self, measurement_id, samples, shots, coefficients):
+        if coefficients is None:
+            coefficients = np.empty((samples.shape[0], 0))
+        size = HEADER_DTYPE.itemsize + coefficients.nbytes
+        size += samples.nbytes + shots.nbytes
+        if self._shm is None or self._shm.size < size:
+            self._replace(size + size // 4)  # headroom for a few more shots
+        header = self._header
+        self.generation += 1  # odd, being written
+        header["generation"] = self.generation
+        header["measurement_id"] = measurement_id
+        header["nsamples"], header["nshots"] = samples.shape
+        header["nrows"] = shots.shape[0]
+        header["ncoefficients"] = coefficients.shape[1]
+        header["dtype"] = samples.dtype.str
+        views = _views(self._shm.buf, header)
+        for view, data in zip(views, [coefficients, samples, shots]):
+            view[:] = data
+        del views  # release exported buffers, so the segment can be closed
+        self.generation += 1
+        header["generation"] = self.generation
+
+    def _replace(self, size):
+        self._close()
+        self._shm = shared_memory.SharedMemory(create=True, size=size)
+        _created.add(self._shm.name)
+        self._header = np.ndarray((), HEADER_DTYPE, buffer=self._shm.buf)
+        self._header["generation"] = self.generation
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        if self._shm is None:
+            return
+        self._header["retired"] = 1
+        self._header = None
+        self._shm.close()
+        self._shm.unlink()
+        _created.discard(self._shm.name)
+        self._shm = None
+
+
+class SharedMemoryReader:
+    """Read samples and shots published by a daemon on the same machine.
+
+    Use the name from the daemon's get_shared_memory_info message. Once retired is
+    set, ask the daemon for the name of the new segment.
+    """
+
+    def __init__(self, name):
+        self._shm = shared_memory.SharedMemory(name=name)
+        if os.name == "posix" and name not in _created:
+            # the publisher owns the segment, it must not be unlinked when we exit,
+            # a publisher in this process shares our tracker and unregisters itself
+            resource_tracker.unregister(self._shm._name, "shared_memory")
+        self._header = np.ndarray((), HEADER_DTYPE, buffer=self._shm.buf)
+
+    @property
+    def retired(self) -> bool:
+        return bool(self._header["retired"])
+
+    @property
+    def measurement_id(self) -> int:
+        return int(self._header["measurement_id"])
+
+    def read(self, scale=True, timeout=1.0):
+        """Copy out a consistent (measurement_id, samples, shots).
+
+        Raw codes are scaled to volts unless scale is False. Retries while the
+        publisher writes, for up to timeout seconds.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            generation = int(self._header["generation"])
+            if not generation % 2:  # odd while being written
+                header = self._header.copy()
+                try:
+                    views = _views(self._shm.buf, header)
+                except (TypeError, ValueError):
+                    views = None  # header was torn by a concurrent write
+                if views is not None:
+                    coefficients, samples, shots = (v.copy() for v in views)
+                    del views
+                    if int(self._header["generation"]) == generation:
+                        break
+            if time.monotonic() > deadline:
+                raise TimeoutError("shared memory is being written too often to read")
+            time.sleep(0.001)  # let the publisher finish
+        if scale and coefficients.shape[1]:
+            from ._ni_daqmx_tmux import scale_samples
+
+            samples = scale_samples(samples, coefficients)
+        return int(header["measurement_id"]), samples, shots
+
+    def close(self):
+        self._header = None
+        self._shm.close()
@@ -0,0 +1,228 @@
+"""Simulated stand-in for the subset of PyDAQmx used by ni-daqmx-tmux.
+
+Models an externally triggered device: shots arrive at the configured trigger rate,
+and every shot the task round robins over its virtual channels. Physical channels
+configured as daemon channels carry a gaussian pulse centered in their signal window,
+chopper channels carry a square wave, and every sample gets gaussian noise.
+"""
+
+__all__ = ["SimulatedDAQmx", "DAQError"]
+
+
+import ctypes
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np  # type: ignore
+
+
+class DAQError(Exception):
+    def __init__(self, error, message):
+        super().__init__(f"DAQmx error {error}: {message}")
+        self.error = error
+
+
+@dataclass
+class _Task:
+    channels: List[str] = field(default_factory=list)  # physical channel of each
+    names: List[str] = field(default_factory=list)
+    ranges: List[tuple] = field(default_factory=list)
+    continuous: bool = False
+    buffer_shots: int = 0
+    running: bool = False
+    started: float = 0.0  # time of first trigger
+    shots_read: int = 0
+    stopped: threading.Event = field(default_factory=threading.Event)
+    waveforms: Optional[np.ndarray] = None  # shape (chopper phase, sample)
+    chopper_samples: Optional[np.ndarray] = None  # virtual channels reading a chopper
+
+
+class SimulatedDAQmx:
+    """Simulated device, with functions named as in PyDAQmx."""
+
+    DAQError = DAQError
+    TaskHandle = ctypes.c_void_p
+    int32 = ctypes.c_int32
+    uInt32 = ctypes.c_uint32
+    byref = staticmethod(ctypes.byref)
+
+    DAQmx_Val_Diff = 10106
+    DAQmx_Val_Volts = 10348
+    DAQmx_Val_Rising = 10280
+    DAQmx_Val_FiniteSamps = 10178
+    DAQmx_Val_ContSamps = 10123
+    DAQmx_Val_GroupByScanNumber = 1
+
+    product_type = "PCI-6251"
+    serial_number = 0  # as reported by NI MAX for simulated devices
+    voltage_ranges = [0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0]  # as pci-6251
+    chopper_high = 5.0  # volts
+
+    def __init__(
+        self,
+        channels,
+        choppers,
+        rep_rate=1000.0,
+        noise=0.01,
+        pulse_amplitude=1.0,
+        chopper_period=2,
+        error_probability=0.0,
+    ):
+        self.rep_rate = rep_rate
+        self.noise = noise
+        self.pulse_amplitude = pulse_amplitude
+        self.chopper_period = max(chopper_period, 1)
+        self.error_probability = error_probability
+        self._pulses = {
+            c.physical_channel: (c.signal_start, c.signal_stop)
+            for c in channels
+            if c.enabled
+        }
+        self._choppers = [c.physical_channel for c in choppers if c.enabled]
+        self._tasks: Dict[int, _Task] = {}
+        self._rng = np.random.default_rng()
+
+    def _task(self, handle) -> _Task:
+        try:
+            return self._tasks[handle.value]
+        except KeyError:
+            raise DAQError(-200088, "task specified is invalid or does not exist")
+
+    # device --------------------------------------------------------------------------
+
+    def GetDevProductType(self, device, data, size):
+        data.value = self.product_type.encode()[: size - 1]
+
+    def GetDevSerialNum(self, device, serial_ref):
+        serial_ref._obj.value = self.serial_number
+
+    def GetDevAIVoltageRngs(self, device, data, size):
+        for i, r in enumerate(self.voltage_ranges[: size // 2]):
+            data[2 * i] = -r
+            data[2 * i + 1] = r
+
+    # task lifecycle ------------------------------------------------------------------
+
+    def DAQmxCreateTask(self, name, handle_ref):
+        handle = handle_ref._obj
+        handle.value = max(self._tasks, default=0) + 1
+        self._tasks[handle.value] = _Task()
+
+    def DAQmxClearTask(self, handle):
+        task = self._tasks.pop(handle.value, None)
+        if task is not None:
+            task.stopped.set()
+
+    def DAQmxCreateAIVoltageChan(
+        self, handle, physical, name, terminal, min_voltage, max_voltage, units, scale
+    ):
+        task = self._task(handle)
+        task.channels.append(physical.rsplit("/", 1)[-1])
+        task.names.append(name)
+        task.ranges.append((min_voltage, max_voltage))
+
+    def DAQmxCfgSampClkTiming(self, handle, source, rate, edge, mode, samples):
+        task = self._task(handle)
+        if task.running:
+            raise DAQError(
+                -200479, "specified operation cannot be performed while running"
+            )
+        task.continuous = mode == self.DAQmx_Val_ContSamps
+        task.buffer_shots = samples
+        self._build_waveforms(task)
+
+    def DAQmxStartTask(self, handle):
+        task = self._task(handle)
+        task.running = True
+        task.stopped.clear()
+        task.started = time.perf_counter()
+        task.shots_read = 0
+
+    def DAQmxStopTask(self, handle):
+        task = self._tasks.get(handle.value)
+        if task is not None:
+            task.running = False
+            task.stopped.set()
+
+    def DAQmxGetAIDevScalingCoeff(self, handle, name, data, size):
+        task = self._task(handle)
+        low, high = task.ranges[task.names.index(name)]
+        data[:size] = 0.0
+        data[1] = (high - low) / 2**16  # volts per code
+
+    # reading -------------------------------------------------------------------------
+
+    def _build_waveforms(self, task):
+        """Compute the noiseless voltage of every virtual channel, per chopper phase."""
+        waveforms = np.zeros((2, len(task.channels)))
+        for index, physical in enumerate(task.channels):
+            if physical in self._pulses:
+                start, stop = self._pulses[physical]
+                center = (start + stop) / 2
+                width = max((stop - start) / 4, 1.0)
+                pulse = np.exp(-0.5 * ((index - center) / width) ** 2)
+                # pulses are half as strong while the chopper blocks
+                waveforms[:, index] = (
+                    self.pulse_amplitude * pulse * np.array([0.5, 1.0])
+                )
+        choppers = [i for i, c in enumerate(task.channels) if c in self._choppers]
+        task.chopper_samples = np.array(choppers, dtype=int)
+        waveforms[1, task.chopper_samples] = self.chopper_high
+        task.waveforms = waveforms
+
+    def _simulate(self, task, first, nshots) -> np.ndarray:
+        """Volts of shots [first, first + nshots), with shape (shot, sample)."""
+        phase = (np.arange(first, first + nshots) // (self.chopper_period / 2)) % 2 == 0
+        volts = task.waveforms[phase.astype(int)]
+        if self.noise:
+            volts += self._rng.normal(scale=self.noise, size=volts.shape)
+        low, high = np.array(task.ranges).T
+        return np.clip(volts, low, high)
+
+    def _wait_for_shots(self, task, nshots, timeout):
+        available_at = task.started + (task.shots_read + nshots) / self.rep_rate
+        delay = available_at - time.perf_counter()
+        if delay > timeout:
+            task.stopped.wait(timeout)
+            raise DAQError(
+                -200284,
+                "some or all of the samples requested have not yet been acquired",
+            )
+        if delay > 0 and task.stopped.wait(delay):
+            raise DAQError(-88709, "task was stopped while reading")
+        if task.continuous:
+            triggered = (time.perf_counter() - task.started) * self.rep_rate
+            if triggered - task.shots_read > task.buffer_shots:
+                raise DAQError(
+                    -200279, "attempted to read samples that are no longer available"
+                )
+        elif task.shots_read + nshots > task.buffer_shots:
+            raise DAQError(-200278, "attempted to read beyond the finite acquisition")
+
+    def _read(self, handle, nshots, timeout, array, size, read_ref):
+        task = self._task(handle)
+        if not task.running:
+            raise DAQError(
+                -200473, "read cannot be performed when the task is not started"
+            )
+        if self._rng.random() < self.error_probability:
+            raise DAQError(-200284, "simulated error")
+        if nshots * len(task.channels) > size:
+            raise DAQError(-200229, "buffer is too small to fit read data")
+        self._wait_for_shots(task, nshots, timeout)
+        volts = self._simulate(task, task.shots_read, nshots)
+        task.shots_read += nshots
+        read_ref._obj.value = nshots
+        return volts.reshape(-1)  # grouped by scan number
+
+    def DAQmxReadAnalogF64(self, handle, nshots, timeout, fill, array, size, read, _):
+        volts = self._read(handle, nshots, timeout, array, size, read)
+        array[: volts.size] = volts
+
+    def DAQmxReadBinaryI16(self, handle, nshots, timeout, fill, array, size, read, _):
+        volts = self._read(handle, nshots, timeout, array, size, read)
+        low, high = np.array(self._task(handle).ranges).T
+        codes = volts.reshape(nshots, -1) / ((high - low) / 2**16)
+        array[: volts.size] = np.clip(np.round(codes), -(2**15), 2**15 - 1).reshape(-1)
@@ -0,0 +1,61 @@
+"""On-disk cache of what the daemon derives from its config at startup.
+
+Each entry is a pickled dictionary in its own file, named by a key hashing
+everything the entry was derived from. Changed settings therefore never read a
+stale entry, they miss and store a new one. The least recently used entries are
+removed beyond max_entries.
+"""
+
+__all__ = ["StartupCache", "startup_key"]
+
+
+import hashlib
+import os
+import pathlib
+import pickle
+from typing import Optional
+
+import platformdirs  # type: ignore
+
+
+def startup_key(*parts: str) -> str:
+    """Hash of parts, in order."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class StartupCache:
+    def __init__(self, directory=None, max_entries=16):
+        if directory is None:
+            directory = platformdirs.user_cache_path("yaqd-ni", "yaq") / "startup"
+        self.directory = pathlib.Path(directory)
+        self.max_entries = max_entries
+
+    def load(self, key) -> Optional[dict]:
+        """Stored entry, or None if missing or unreadable."""
+        path = self.directory / f"{key}.pickle"
+        try:
+            with open(path, "rb") as f:
+                entry = pickle.load(f)
+            os.utime(path)  # recently used
+        except Exception:
+            # a cache miss at worst, e.g. when pickled classes no longer import
+            return None
+        return entry
+
+    def store(self, key, entry: dict):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{key}.pickle"
+        # readers never see a partially written entry
+        temporary = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(temporary, "wb") as f:
+            pickle.dump(entry, f)
+        temporary.replace(path)
+        entries = sorted(
+            self.directory.glob("*.pickle"), key=lambda p: p.stat().st_mtime
+        )
+        for stale in entries[: -self.max_entries]:
+            stale.unlink(missing_ok=True)
@@ -1,5 +1,7 @@
 """Qt based GUI client for ni-daqmx-tmux."""
 
+import ast
+import json
 import sys
 import pathlib
 import time
@@ -10,10 +12,9 @@ import qtypes  # type: ignore
 import yaqc  # type: ignore
 import tomli  # type: ignore
 import numpy as np  # type: ignore
+import platformdirs  # type: ignore
 
-
-# TODO: actually read these values from the driver ---Blaise 2017-01-06
-ranges = [0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0]  # V
+# resolution of pci-6251 ranges, others are assumed to be 16 bit
 resolution = {}  # uV
 resolution[0.1] = 3.2
 resolution[0.2] = 6.4
@@ -23,6 +24,27 @@ resolution[2.0] = 64.0
 resolution[5.0] = 160.0
 resolution[10.0] = 320.0
 
+fetch_timeout = 5.0  # s, after which an unanswered fetch is given up
+redraw_smoothing = 0.1  # weight of the latest frame in the displayed redraw time
+scatter_limit = 5000  # points, above which plots are drawn as lines or envelopes
+envelope_bins = 2000  # of shots plotted as minimum to maximum segments
+histogram_bins = 100
+
+
+def none_on_error(function):
+    """Answer None instead of raising, so that a failed fetch can be made again.
+
+    Threaded client calls that raise never finish, and are not started again.
+    """
+
+    def wrapped(*args, **kwargs):
+        try:
+            return function(*args, **kwargs)
+        except Exception:
+            return None
+
+    return wrapped
+
 
 class Channel:
     def __init__(
@@ -41,6 +63,7 @@ class Channel:
         baseline_presample,
         baseline_method,
         range,
+        voltage_ranges,
         nsamples,
     ):
         self.enabled = qtypes.Bool("Enabled", disabled=True, value=enabled)
@@ -48,8 +71,17 @@ class Channel:
         self.physical_correspondance = qtypes.Integer(
             "Physical correspondance", disabled=True, minimum=0, maximum=7
         )
-        allowed_ranges = ["%0.1f (%0.1f)" % (r, resolution[r]) for r in ranges]
-        self.range = qtypes.Enum("Range", disabled=True, allowed=allowed_ranges)
+        self.voltage_ranges = voltage_ranges  # (min, max) allowed by the device
+        allowed_ranges = [
+            "%0.1f (%0.1f)" % (high, resolution.get(high, 1e6 * (high - low) / 2**16))
+            for low, high in voltage_ranges
+        ]
+        value = {}
+        if tuple(range) in voltage_ranges:
+            value["value"] = allowed_ranges[voltage_ranges.index(tuple(range))]
+        self.range = qtypes.Enum(
+            "Range", disabled=True, allowed=allowed_ranges, **value
+        )
         # TODO: resolution display
         self.invert = qtypes.Bool("invert", disabled=True, value=invert)
         sample_limits = {"minimum": 0, "maximum": nsamples - 1}
@@ -80,7 +112,7 @@ class Channel:
             "baseline pre index",
             disabled=True,
             value=baseline_presample,
-            **sample_limits
+            **sample_limits,
         )
         self.baseline_method = qtypes.Enum(
             "processing",
@@ -110,8 +142,7 @@ class Channel:
             (minimum_voltage, maximum_voltage)
         """
         allowed = self.range.get()["allowed"]
-        r = ranges[allowed.index(self.range.get_value())]
-        return -r, r
+        return self.voltage_ranges[allowed.index(self.range.get_value())]
 
     def get_widget(self, tree):
         self.tree_widget = tree
@@ -172,35 +203,170 @@ class ConfigWidget(QtWidgets.QWidget):
     def __init__(self, qclient):
         super().__init__()
         self.client = qclient
-        task = self.client.get_config()
-        while not task.finished:
-            time.sleep(0.1)
-        config = tomli.loads(task.result)
+        self.tabs = None  # until the config is known
+        self.config = None  # toml text and voltage ranges the widgets are built from
+        self.fetched_config = {}
+        self.cache_path = (
+            platformdirs.user_cache_path("yaqg-ni", "yaq")
+            / f"{qclient.host}-{qclient.port}-{qclient.id()['name']}.json"
+        )
+        self.plotted_measurement_id = None
+        self.fetching = set()  # arrays requested and not yet received
+        self.fetch_started = 0.0
+        self.redraw_seconds = []  # of recent frames
+
+        self.setLayout(QtWidgets.QHBoxLayout())
+        self.layout().setContentsMargins(0, 10, 0, 0)
+        self.placeholder = QtWidgets.QLabel("waiting for config...")
+        self.placeholder.setAlignment(QtCore.Qt.AlignCenter)
+        self.layout().addWidget(self.placeholder)
+        # config
+        self.client.get_config.finished.connect(
+            lambda text: self.on_fetched_config("text", text)
+        )
+        self.client.get_allowed_voltage_ranges.finished.connect(
+            lambda ranges: self.on_fetched_config("ranges", ranges)
+        )
+        self.client.reconnected.connect(self.fetch_config)
+        try:
+            # build at once from the previous session, if the daemon is unchanged
+            # the fetched config will match and nothing is rebuilt
+            self.build(**json.loads(self.cache_path.read_text()))
+        except (OSError, ValueError, TypeError, KeyError):
+            pass
+        self.fetch_config()
+        # measurements
+        for name in [
+            "get_measurement_id",
+            "get_measured_samples_for_shots",
+            "get_measured_shots_row",
+            "get_measured_shots_envelope",
+        ]:
+            wrapper = getattr(self.client, name)
+            wrapper._function = none_on_error(wrapper._function)
+        self.client.get_nshots.finished.connect(self.on_nshots)
+        self.client.get_measurement_id.finished.connect(self.on_measurement_id)
+        self.client.get_measured_samples_for_shots.finished.connect(
+            lambda yi: self.on_fetched("samples", self.update_measured_samples, yi)
+        )
+        self.client.get_measured_shots_row.finished.connect(
+            lambda yi: self.on_fetched("shots", self.update_measured_shots, yi)
+        )
+        self.client.get_measured_shots_envelope.finished.connect(
+            lambda yi: self.on_fetched("shots", self.update_measured_shots_envelope, yi)
+        )
+        self.client._poll_timer.timeout.connect(self.poll)
+
+    def fetch_config(self):
+        self.fetched_config = {}
+        self.client.get_config()
+        self.client.get_allowed_voltage_ranges()
+
+    def on_fetched_config(self, key, value):
+        self.fetched_config[key] = value
+        if len(self.fetched_config) < 2 or self.fetched_config == self.config:
+            return
+        self.build(**self.fetched_config)
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            self.cache_path.write_text(json.dumps(self.config))
+        except OSError:
+            pass  # opening is slower next time, nothing else
+
+    def build(self, text, ranges):
+        """Build the widget tree from config toml text and allowed voltage ranges."""
+        config = tomli.loads(text)
+        # ranges are stringified tuples, to prevent floating point miscommunications
+        voltage_ranges = [tuple(ast.literal_eval(r)) for r in ranges]
         self.nsamples = config["nsamples"]
         self.channels = {}
         for k, d in config["channels"].items():
             if d["name"] is None:
                 d["name"] = k
-            self.channels[k] = Channel(k, **d, nsamples=self.nsamples)
+            self.channels[k] = Channel(
+                k, **d, voltage_ranges=voltage_ranges, nsamples=self.nsamples
+            )
         self.choppers = {}
         for k, d in config["choppers"].items():
             if d["name"] is None:
                 d["name"] = k
             self.choppers[k] = Chopper(k, **d, nsamples=self.nsamples)
-
+        # replace placeholder or previous tree
+        old = self.placeholder if self.tabs is None else self.tabs
+        self.layout().removeWidget(old)
+        old.deleteLater()
         self.create_frame()
-        self.client.get_measured_samples.finished.connect(self.update_measured_samples)
-        self.client.get_measured_shots.finished.connect(self.update_measured_shots)
         self.rest_channel.set_value(config["rest_channel"])
-        self.client._poll_timer.timeout.connect(self.poll)
+        self.config = {"text": text, "ranges": list(ranges)}
+        self.fetching.clear()
+        self.refetch()
+
+    def on_nshots(self, nshots):
+        if self.tabs is not None:
+            self.nshots.set_value(nshots)
 
     def poll(self):
-        self.client.get_measured_samples()
-        self.client.get_measured_shots()
+        if self.tabs is None:
+            return
+        # a slow plot must not queue up requests, wait for the last fetch
+        if self.fetching and time.time() - self.fetch_started < fetch_timeout:
+            return
+        self.fetching = {"measurement_id"}
+        self.fetch_started = time.time()
+        self.client.get_measurement_id()
+
+    def on_measurement_id(self, measurement_id):
+        self.fetching.discard("measurement_id")
+        if measurement_id == self.plotted_measurement_id or self.fetching:
+            return
+        if not measurement_id:
+            return  # nothing measured yet, or the daemon did not answer
+        self.plotted_measurement_id = measurement_id
+        # only fetch what is plotted: the first shot of samples, one row of shots
+        self.fetching.add("samples")
+        self.client.get_measured_samples_for_shots([0])
+        name = self.get_shot_row_name()
+        if name is None:
+            return
+        self.fetching.add("shots")
+        if self.shots_histogram.get_value():
+            self.client.get_measured_shots_row(name)
+        elif self.nshots.get_value() > scatter_limit:
+            # too many to scatter, and to send every poll
+            self.client.get_measured_shots_envelope(name, envelope_bins)
+        else:
+            self.client.get_measured_shots_row(name)
+
+    def on_fetched(self, kind, update, yi):
+        self.fetching.discard(kind)
+        if yi is None:
+            self.refetch()  # failed, try again at the next poll
+            return
+        start = time.perf_counter()
+        update(yi)
+        self.redraw_seconds.append(time.perf_counter() - start)
+        if not self.fetching:
+            # one frame is done once every fetched array is drawn
+            frame = sum(self.redraw_seconds)
+            self.redraw_seconds.clear()
+            self.redraw_ms.set_value(
+                redraw_smoothing * 1e3 * frame
+                + (1 - redraw_smoothing) * self.redraw_ms.get_value()
+            )
+
+    def refetch(self):
+        """Fetch arrays again at the next poll, even without a new measurement."""
+        self.plotted_measurement_id = None
+
+    def get_shot_row_name(self):
+        """Name of the selected shots row, None if its channel is disabled."""
+        key = self.shot_channel_combo.get_value()
+        channel = self.channels[key] if key in self.channels else self.choppers[key]
+        if not channel.enabled.get_value():
+            return None
+        return channel.name.get_value()
 
     def create_frame(self):
-        self.setLayout(QtWidgets.QHBoxLayout())
-        self.layout().setContentsMargins(0, 10, 0, 0)
         self.tabs = QtWidgets.QTabWidget()
         # samples tab
         samples_widget = QtWidgets.QSplitter()
@@ -224,8 +390,12 @@ class ConfigWidget(QtWidgets.QWidget):
         layout.addWidget(display_container_widget)
         # plot
         self.samples_plot_widget = Plot1D(yAutoRange=False)
-        self.samples_plot_scatter = self.samples_plot_widget.add_scatter(color=0.25)
-        self.samples_plot_active_scatter = self.samples_plot_widget.add_scatter()
+        if self.nsamples > scatter_limit:
+            add = self.samples_plot_widget.add_line
+        else:
+            add = self.samples_plot_widget.add_scatter
+        self.samples_plot_scatter = add(color=0.25)
+        self.samples_plot_active_scatter = add()
         self.samples_plot_widget.set_labels(xlabel="sample", ylabel="volts")
         self.samples_plot_max_voltage_line = self.samples_plot_widget.add_infinite_line(
             color="y", angle=0
@@ -313,6 +483,8 @@ class ConfigWidget(QtWidgets.QWidget):
         # plot
         self.shots_plot_widget = Plot1D()
         self.shots_plot_scatter = self.shots_plot_widget.add_scatter()
+        self.shots_plot_envelope = self.shots_plot_widget.add_envelope()
+        self.shots_plot_histogram = self.shots_plot_widget.add_histogram()
         self.shots_plot_widget.set_labels(xlabel="shot", ylabel="volts")
         display_layout.addWidget(self.shots_plot_widget)
         # settings
@@ -325,10 +497,14 @@ class ConfigWidget(QtWidgets.QWidget):
         root_item.append(self.shot_channel_combo)
         self.shot_channel_combo.updated_connect(self.on_shot_channel_updated)
         self.nshots = qtypes.Integer("Shots", value=0, minimum=0)
-        self.client.get_nshots.finished.connect(self.nshots.set_value)
         self.client.get_nshots()
         self.nshots.edited_connect(self.on_nshots_updated)
         root_item.append(self.nshots)
+        self.shots_histogram = qtypes.Bool("Histogram", value=False)
+        self.shots_histogram.updated_connect(self.on_shots_histogram_updated)
+        root_item.append(self.shots_histogram)
+        self.redraw_ms = qtypes.Float("Redraw (ms)", disabled=True, value=0.0)
+        root_item.append(self.redraw_ms)
         # self.shots_processing_module_path = qtypes.Filepath(name="Shots Processing")
         # root_item.append(self.shots_processing_module_path)
         tree_widget = qtypes.TreeWidget(root_item)
@@ -387,10 +563,20 @@ class ConfigWidget(QtWidgets.QWidget):
     def on_nshots_updated(self, new):
         self.client.set_nshots(new["value"])
 
+    def on_shots_histogram_updated(self, value=None):
+        self.refetch()
+        if self.shots_histogram.get_value():
+            self.shots_plot_widget.set_labels(xlabel="volts", ylabel="shots")
+            self.shots_plot_widget.plot_object.enableAutoRange()
+        else:
+            self.shots_plot_widget.set_labels(xlabel="shot", ylabel="volts")
+            self.on_shot_channel_updated()
+
     def on_shot_channel_updated(self, value=None):
         # update y range to be range of channel
         if not value:
             value = self.shot_channel_combo.get()
+        self.refetch()
         channel_index = value["allowed"].index(value["value"])
         active_channels = [
             channel for channel in self.channels.values() if channel.enabled.get_value()
@@ -411,7 +597,6 @@ class ConfigWidget(QtWidgets.QWidget):
     def update_measured_samples(self, yi):
         # all samples
         yi = yi[:, 0]
-        self.samples_plot_scatter.clear()
         self.samples_plot_scatter.setData(self.sample_xi, yi)
         # active samples
         # self.samples_plot_active_scatter.hide()
@@ -436,14 +621,32 @@ class ConfigWidget(QtWidgets.QWidget):
             self.samples_plot_active_scatter.setData(xi, yyi)
 
     def update_measured_shots(self, yi):
-        # shots
-        shot_channel_options = self.shot_channel_combo.get()["allowed"]
-        yi = yi[int(shot_channel_options.index(self.shot_channel_combo.get_value()))]
-        xi = np.arange(len(yi))
-        self.shots_plot_scatter.clear()
-        self.shots_plot_scatter.setData(xi, yi)
+        # shots of the selected row
+        if self.shots_histogram.get_value():
+            counts, edges = np.histogram(yi[np.isfinite(yi)], bins=histogram_bins)
+            self.shots_plot_histogram.setData(edges, counts)
+            self.show_shots_plot_item(self.shots_plot_histogram)
+        else:
+            self.shots_plot_scatter.setData(np.arange(len(yi)), yi)
+            self.show_shots_plot_item(self.shots_plot_scatter)
+
+    def update_measured_shots_envelope(self, envelope):
+        # minimum and maximum of the selected row within bins of measured shots, which
+        # batches and adaptive measurements hold more of than planned
+        xi = envelope[0]
+        self.shots_plot_envelope.setData(np.repeat(xi, 2), envelope[1:].T.ravel())
+        self.show_shots_plot_item(self.shots_plot_envelope)
+
+    def show_shots_plot_item(self, item):
+        for other in [
+            self.shots_plot_scatter,
+            self.shots_plot_envelope,
+            self.shots_plot_histogram,
+        ]:
+            other.setVisible(other is item)
 
     def update_samples_tab(self, value=None):
+        self.refetch()  # active samples are drawn from fetched samples
         # buttons
         allowed = self.samples_channel_combo.get()["allowed"]
         num_channels = len(allowed)
@@ -535,6 +738,20 @@ class Plot1D(pg.GraphicsView):
         self.plot_object.addItem(curve)
         return curve
 
+    def add_envelope(self, color="c"):
+        """Add vertical segments between consecutive pairs of points."""
+        curve = pg.PlotCurveItem(pen=(color), connect="pairs")
+        self.plot_object.addItem(curve)
+        return curve
+
+    def add_histogram(self, color="c"):
+        """Add a step curve, set with bin edges and counts."""
+        curve = pg.PlotDataItem(
+            stepMode="center", fillLevel=0, pen=(color), brush=(color)
+        )
+        self.plot_object.addItem(curve)
+        return curve
+
     def add_infinite_line(
         self, color="y", style="solid", angle=90.0, movable=False, hide=True
     ):